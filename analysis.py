@@ -0,0 +1,290 @@
+# --- PRÉ-AGRÉGATION DES LOGS / CSV ---
+# Plutôt que de coller des logs bruts dans le chat, on les résume localement :
+# les lignes sont découpées en colonnes par lots, puis agrégées avec des
+# opérations vectorisées NumPy (comptages, histogrammes, seaux temporels).
+# Seul le digest compact est injecté dans la conversation envoyée à Groq.
+import csv
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+import ingestion
+import intel
+import ioc
+import pdf_extract
+
+BATCH_LINES = int(os.environ.get("CYBER_ANALYSIS_BATCH_LINES", "50000"))
+TOP_N = 10
+RARE_MAX_COUNT = 2
+MAX_BUCKETS = 24
+DIGEST_TYPES = {"log", "csv"}
+TEXT_TYPES = {"txt"}
+PDF_TYPES = {"pdf"}
+SUPPORTED_TYPES = DIGEST_TYPES | TEXT_TYPES | PDF_TYPES
+# Les tableaux NumPy de chaînes ont la largeur de leur plus long élément : les
+# user-agents sont tronqués pour que la mémoire d'un lot reste bornée. Les
+# lignes complètes, elles, ne sont jamais converties en tableau.
+MAX_TEXT_CHARS = 128
+
+_IPV4 = re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}\b")
+_COMBINED = re.compile(
+    r'^(\S+) \S+ \S+ \[(\d{2}/\w{3}/\d{4}:\d{2})[^\]]*\] "[^"]*" (\d{3}) \S+(?: "[^"]*" "([^"]*)")?'
+)
+_ISO_HOUR = re.compile(r"(\d{4}-\d{2}-\d{2})[T ](\d{2})")
+_SYSLOG_HOUR = re.compile(r"^([A-Z][a-z]{2}\s+\d{1,2}) (\d{2}):")
+_FAILURE_MARKERS = ("failed", "failure", "invalid user", "denied", "refused", "échec")
+_FAILURE_TEXT = re.compile("|".join(map(re.escape, _FAILURE_MARKERS)), re.IGNORECASE)
+_MONTHS = {name: n for n, name in enumerate(
+    ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"), start=1)}
+_FAILURE_STATUSES = ("401", "403")
+
+# Noms de colonnes CSV reconnus pour chaque champ (en minuscules)
+CSV_FIELDS = {
+    "ip": ("src_ip", "source_ip", "ip", "src", "source", "client_ip", "remote_addr", "ipaddress"),
+    "time": ("timestamp", "time", "date", "datetime", "@timestamp", "eventtime"),
+    "status": ("status", "status_code", "http_status", "code", "sc-status"),
+    "user_agent": ("user_agent", "useragent", "user-agent", "agent", "cs(user-agent)"),
+}
+
+
+# Les seaux horaires sont des clés ISO ("2024-03-09 14:00") : leur ordre
+# alphabétique est l'ordre chronologique. Syslog ne donne pas l'année ("03-09 14:00").
+def _hour_bucket(text):
+    match = _ISO_HOUR.search(text)
+    if match:
+        return f"{match.group(1)} {match.group(2)}:00"
+    match = _SYSLOG_HOUR.search(text)
+    if match:
+        month, day = match.group(1).split()
+        if month in _MONTHS:
+            return f"{_MONTHS[month]:02d}-{int(day):02d} {match.group(2)}:00"
+    return ""
+
+
+def _combined_bucket(stamp):
+    # "10/Oct/2023:13" (format combined d'Apache / nginx)
+    day, month, rest = stamp.split("/")
+    year, hour = rest.split(":")
+    if month not in _MONTHS:
+        return ""
+    return f"{year}-{_MONTHS[month]:02d}-{day} {hour}:00"
+
+
+def _failure_mask(texts, statuses):
+    """Masque booléen des échecs sur le lot.
+
+    Les marqueurs sont cherchés sur les lignes complètes (une regex par ligne) : convertir
+    les lignes en tableau NumPy les élargirait toutes à la plus longue.
+    """
+    mask = np.fromiter((_FAILURE_TEXT.search(text) is not None for text in texts), dtype=bool, count=len(texts))
+    mask |= np.isin(statuses, _FAILURE_STATUSES)
+    return mask
+
+
+class EvidenceDigest:
+    """Accumulateur d'agrégats, alimenté lot par lot (mémoire bornée)."""
+
+    def __init__(self, name):
+        self.name = name
+        self.lines = 0
+        self.skipped = 0  # lignes CSV illisibles (champ démesuré, guillemets mal formés)
+        self.parsed = 0
+        self.failures = 0
+        self.ips = Counter()
+        self.statuses = Counter()
+        self.user_agents = Counter()
+        self.bucket_total = Counter()
+        self.bucket_failed = Counter()
+
+    def add_batch(self, ips, buckets, statuses, user_agents, texts):
+        ips = np.asarray(ips, dtype=str)
+        buckets = np.asarray(buckets, dtype=str)
+        statuses = np.asarray(statuses, dtype=str)
+        user_agents = np.asarray([ua[:MAX_TEXT_CHARS] for ua in user_agents], dtype=str)
+        failed = _failure_mask(texts, statuses)
+
+        self.lines += len(texts)
+        self.parsed += int(np.count_nonzero((ips != "") | (buckets != "") | (statuses != "")))
+        self.failures += int(np.count_nonzero(failed))
+        _count_into(self.ips, ips)
+        _count_into(self.statuses, statuses)
+        _count_into(self.user_agents, user_agents)
+
+        # Total et échecs par seau horaire : np.unique + bincount pondéré
+        keys, inverse = np.unique(buckets, return_inverse=True)
+        totals = np.bincount(inverse, minlength=len(keys))
+        fails = np.bincount(inverse, weights=failed, minlength=len(keys))
+        for key, total, fail in zip(keys, totals, fails):
+            if key:
+                self.bucket_total[key] += int(total)
+                self.bucket_failed[key] += int(fail)
+
+    def to_text(self, top=TOP_N):
+        parts = [f"[DIGEST PREUVE] {self.name} : {self.lines} lignes, {self.parsed} structurées, "
+                 f"{self.failures} échecs d'authentification/accès."]
+        if self.skipped:
+            parts.append(f"Lignes illisibles ignorées : {self.skipped}.")
+        if self.ips:
+            parts.append("Top IP sources : " + _format_counts(self.ips.most_common(top)))
+        if self.statuses:
+            parts.append("Codes de statut : " + _format_counts(sorted(self.statuses.items())))
+        if self.bucket_total:
+            buckets = sorted(self.bucket_total)[-MAX_BUCKETS:]
+            rates = [f"{b} {self.bucket_failed[b]}/{self.bucket_total[b]} "
+                     f"({self.bucket_failed[b] / self.bucket_total[b]:.0%})" for b in buckets]
+            parts.append("Échecs par heure : " + "; ".join(rates))
+        rare = [(ua, n) for ua, n in self.user_agents.items() if n <= RARE_MAX_COUNT]
+        if rare:
+            rare.sort(key=lambda item: (item[1], item[0]))
+            parts.append("User-agents rares : " + _format_counts(rare[:top]))
+        return "\n".join(parts)
+
+
+def _count_into(counter, values):
+    keys, counts = np.unique(values, return_counts=True)
+    for key, count in zip(keys, counts):
+        if key:
+            counter[str(key)] += int(count)
+
+
+def _format_counts(items):
+    return ", ".join(f"{key} ({count})" for key, count in items)
+
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _log_columns(lines):
+    ips, buckets, statuses, agents = [], [], [], []
+    for line in lines:
+        match = _COMBINED.match(line)
+        if match:
+            ips.append(match.group(1))
+            buckets.append(_combined_bucket(match.group(2)))
+            statuses.append(match.group(3))
+            agents.append(match.group(4) or "")
+            continue
+        ip = _IPV4.search(line)
+        ips.append(ip.group(0) if ip else "")
+        buckets.append(_hour_bucket(line))
+        statuses.append("")
+        agents.append("")
+    return ips, buckets, statuses, agents
+
+
+def _csv_column_map(header):
+    normalized = [name.strip().lower() for name in header]
+    mapping = {}
+    for field, candidates in CSV_FIELDS.items():
+        for candidate in candidates:
+            if candidate in normalized:
+                mapping[field] = normalized.index(candidate)
+                break
+    return mapping
+
+
+def _csv_columns(rows, mapping):
+    def column(field):
+        index = mapping.get(field)
+        if index is None:
+            return [""] * len(rows)
+        return [row[index].strip() if index < len(row) else "" for row in rows]
+
+    times = column("time")
+    return (column("ip"), [_hour_bucket(t) for t in times], column("status"),
+            column("user_agent"), [",".join(row) for row in rows])
+
+
+def digest_log(name, lines, batch_lines=BATCH_LINES):
+    digest = EvidenceDigest(name)
+    for batch in _batched(lines, batch_lines):
+        ips, buckets, statuses, agents = _log_columns(batch)
+        digest.add_batch(ips, buckets, statuses, agents, batch)
+    return digest
+
+
+def _csv_rows(reader, digest):
+    # Une ligne que le module csv refuse (champ au-delà de csv.field_size_limit(),
+    # guillemets mal formés) est comptée et ignorée ; le lecteur reprend à la suivante
+    while True:
+        try:
+            yield next(reader)
+        except StopIteration:
+            return
+        except csv.Error:
+            digest.skipped += 1
+
+
+def digest_csv(name, lines, batch_lines=BATCH_LINES):
+    digest = EvidenceDigest(name)
+    rows = _csv_rows(csv.reader(lines), digest)
+    header = next(rows, None)
+    if header is None:
+        return digest
+    mapping = _csv_column_map(header)
+    for batch in _batched(rows, batch_lines):
+        ips, buckets, statuses, agents, texts = _csv_columns(batch, mapping)
+        digest.add_batch(ips, buckets, statuses, agents, texts)
+    return digest
+
+
+def digest_pdf(name, pages):
+    chars = sum(len(page) for page in pages)
+    return f"[PDF PREUVE] {name} : {len(pages)} pages, {chars} caractères de texte extrait."
+
+
+def _with_iocs(digest, extractor, name, skip=()):
+    """Lignes du tableau IOC et digest complété du tableau IOC et des correspondances de la base locale."""
+    known = intel.get_store().match(extractor.values(), normalized=True)
+    rows = extractor.rows()
+    if known:
+        for row in rows:
+            row["menace"] = known.get(row["valeur"], "")
+    parts = (digest, extractor.to_text(name, skip=skip), intel.format_matches(known, name))
+    return rows, "\n".join(part for part in parts if part) or None
+
+
+def analyze_ingested(ingested, progress=None, index=None):
+    """Analyse d'un fichier ingéré : digest pour log/csv/pdf, simples stats pour txt.
+
+    Les IOC (voir ioc.py) sont extraits dans la même passe et ajoutés au digest, avec
+    ceux que connaît la base de menaces locale (voir intel.py).
+    Si `index` (retrieval.BM25Index) est fourni, le contenu y est indexé dans la même passe.
+    """
+    extractor = ioc.IocExtractor()
+    if ingested.extension in PDF_TYPES:
+        extracted = pdf_extract.extract_pdf(ingested, progress=progress)
+        for n, page in enumerate(extracted["pages"]):
+            extractor.feed(page + "\n")
+            if index is not None:
+                index.add_text(f"{ingested.name} p.{n + 1}", page)
+        extractor.finish()
+        lines = sum(len(page.splitlines()) for page in extracted["pages"])
+        rows, digest = _with_iocs(digest_pdf(ingested.name, extracted["pages"]), extractor, ingested.name)
+        return {"lines": lines, "pages": len(extracted["pages"]), "iocs": rows, "digest": digest}
+
+    lines = ingested.iter_lines()
+    if index is not None:
+        lines = index.tap_lines(ingested.name, lines)
+    lines = extractor.tap_lines(lines)
+    if ingested.extension == "csv":
+        digest = digest_csv(ingested.name, lines)
+    elif ingested.extension in DIGEST_TYPES:
+        digest = digest_log(ingested.name, lines)
+    else:
+        stats = ingestion.line_stats(ingested, lines)
+        rows, digest = _with_iocs(None, extractor, ingested.name)
+        return {"lines": stats["lines"], "iocs": rows, "digest": digest}
+    # Les IP sources les plus fréquentes sont déjà dans le digest
+    rows, text = _with_iocs(digest.to_text(), extractor, ingested.name, skip=("ipv4",))
+    return {"lines": digest.lines, "iocs": rows, "digest": text}
@@ -0,0 +1,157 @@
+# --- EXTRACTION DES ARCHIVES ZIP DE PREUVES ---
+# Les membres sont lus un par un en flux (jamais l'archive entière en mémoire)
+# puis confiés à un pool de threads selon leur type. Ces threads ne parallélisent
+# pas l'analyse des logs/CSV (Python pur, sous le GIL) : ils recouvrent la
+# décompression du membre suivant (zlib relâche le GIL), les écritures du spill
+# disque et l'attente des PDF, dont l'extraction part dans le pool de process
+# de pdf_extract.py. L'index BM25 partagé, alimenté pendant l'analyse, exclut
+# un pool de process pour les autres types. Des limites sur la taille
+# décompressée totale, le taux de compression et le nombre de membres
+# protègent le worker contre les zip bombs.
+import os
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import analysis
+import ingestion
+
+ZIP_MAX_WORKERS = int(os.environ.get("CYBER_ZIP_MAX_WORKERS", "4"))
+ZIP_MAX_MEMBERS = int(os.environ.get("CYBER_ZIP_MAX_MEMBERS", "10000"))
+ZIP_MAX_TOTAL_SIZE = int(os.environ.get("CYBER_ZIP_MAX_TOTAL_SIZE", str(2 * 1024 ** 3)))
+ZIP_MAX_RATIO = float(os.environ.get("CYBER_ZIP_MAX_RATIO", "100"))
+
+MEMBER_KINDS = {"log": "log", "csv": "csv", "txt": "txt", "pdf": "pdf"}
+
+
+class ArchiveLimitError(Exception):
+    """Archive refusée : limites de décompression dépassées (zip bomb probable)."""
+
+
+class _LimitedReader:
+    """Lecteur de membre qui refuse de produire plus que la taille déclarée ou le budget restant."""
+
+    def __init__(self, raw, declared_size, budget):
+        self._raw = raw
+        self._remaining = declared_size
+        self._budget = budget
+
+    def seekable(self):
+        return False
+
+    def read(self, size=-1):
+        limit = self._remaining + 1 if size is None or size < 0 else min(size, self._remaining + 1)
+        data = self._raw.read(limit)
+        self._remaining -= len(data)
+        if self._remaining < 0:
+            raise ArchiveLimitError("Membre plus volumineux que la taille déclarée dans l'archive.")
+        self._budget.consume(len(data))
+        return data
+
+
+class _Budget:
+    def __init__(self, total):
+        self.remaining = total
+
+    def consume(self, n):
+        self.remaining -= n
+        if self.remaining < 0:
+            raise ArchiveLimitError("Taille décompressée totale de l'archive dépassée.")
+
+
+def member_kind(filename):
+    return MEMBER_KINDS.get(os.path.splitext(filename)[1].lower().lstrip("."))
+
+
+def _check_declared(members, max_members, max_total):
+    if len(members) > max_members:
+        raise ArchiveLimitError(f"Trop de membres dans l'archive ({len(members)} > {max_members}).")
+    if sum(info.file_size for info in members) > max_total:
+        raise ArchiveLimitError("Taille décompressée déclarée supérieure à la limite.")
+
+
+def _suspicious_ratio(info, max_ratio):
+    return info.compress_size and info.file_size / info.compress_size > max_ratio
+
+
+def _process_member(ingested, index):
+    try:
+        result = analysis.analyze_ingested(ingested, index=index)
+        return {"status": "ok", **result}
+    finally:
+        ingested.close()
+
+
+def iter_zip_results(fileobj, index=None, max_workers=ZIP_MAX_WORKERS, max_members=ZIP_MAX_MEMBERS,
+                     max_total=ZIP_MAX_TOTAL_SIZE, max_ratio=ZIP_MAX_RATIO):
+    """Traite une archive ZIP membre par membre et produit un résultat par membre, au fil de l'eau.
+
+    Les `max_workers` threads recouvrent décompression, I/O et extraction PDF (process
+    séparés) ; l'analyse des logs et CSV reste limitée par le GIL à un cœur.
+
+    Chaque résultat est un dict : name, kind, size, status ("ok" / "skipped" / "error"),
+    done, total, plus lines / digest / detail selon le cas. Le contenu des membres est
+    indexé dans `index` (retrieval.BM25Index) s'il est fourni. Lève ArchiveLimitError si
+    l'archive dépasse les limites.
+    """
+    with zipfile.ZipFile(fileobj) as archive:
+        members = [info for info in archive.infolist() if not info.is_dir()]
+        _check_declared(members, max_members, max_total)
+        budget = _Budget(max_total)
+        total = len(members)
+        done = 0
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="zip-member") as pool:
+            pending = {}
+
+            def finished(futures):
+                nonlocal done
+                for future in futures:
+                    base = pending.pop(future)
+                    done += 1
+                    try:
+                        outcome = future.result()
+                    except Exception as e:
+                        outcome = {"status": "error", "detail": str(e)}
+                    yield {**base, **outcome, "done": done, "total": total}
+
+            try:
+                for info in members:
+                    base = {"name": info.filename, "kind": member_kind(info.filename), "size": info.file_size}
+                    if base["kind"] is None:
+                        done += 1
+                        yield {**base, "status": "skipped", "detail": "Type non pris en charge.",
+                               "done": done, "total": total}
+                        continue
+                    if _suspicious_ratio(info, max_ratio):
+                        # Membre ignoré sans être décompressé : zip bomb probable
+                        done += 1
+                        yield {**base, "status": "error", "detail": "Taux de compression suspect, membre ignoré.",
+                               "done": done, "total": total}
+                        continue
+
+                    # Lecture séquentielle et bornée du membre (spill disque au-delà du seuil)
+                    try:
+                        with archive.open(info) as raw:
+                            ingested = ingestion.IngestedFile.from_stream(
+                                _LimitedReader(raw, info.file_size, budget), info.filename, size=info.file_size
+                            )
+                    except (RuntimeError, NotImplementedError, zipfile.BadZipFile) as e:
+                        # Membre chiffré, compression non prise en charge ou données corrompues :
+                        # seul ce membre est en échec, le reste de l'archive est traité
+                        done += 1
+                        yield {**base, "status": "error", "detail": str(e) or type(e).__name__,
+                               "done": done, "total": total}
+                        continue
+                    pending[pool.submit(_process_member, ingested, index)] = base
+
+                    # Nombre de membres en vol borné : la mémoire reste constante
+                    ready, _ = wait(pending, timeout=0 if len(pending) < max_workers * 2 else None,
+                                    return_when=FIRST_COMPLETED)
+                    yield from finished(ready)
+
+                while pending:
+                    ready, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    yield from finished(ready)
+            finally:
+                for future in pending:
+                    future.cancel()
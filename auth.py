@@ -0,0 +1,208 @@
+# --- SERVICE D'AUTHENTIFICATION ---
+# Les mots de passe sont dérivés avec scrypt salé (lent par construction). Pour
+# ne pas bloquer le thread du script Streamlit pendant les pics de connexions,
+# le hachage tourne dans un pool de threads borné, avec un plafond de requêtes
+# en attente et des métriques de file. Les anciens comptes (SHA-256 non salé)
+# sont migrés de façon transparente lors de leur prochaine connexion.
+import base64
+import hashlib
+import hmac
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import db
+import metrics
+
+AUTH_WORKERS = int(os.environ.get("CYBER_AUTH_WORKERS", "4"))
+AUTH_MAX_PENDING = int(os.environ.get("CYBER_AUTH_MAX_PENDING", "64"))
+AUTH_TIMEOUT = float(os.environ.get("CYBER_AUTH_TIMEOUT", "10"))
+SCRYPT_N = int(os.environ.get("CYBER_SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+_LEGACY_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+_EMAIL = re.compile(r'^[\w\.-]+@[\w\.-]+\.\w+$')
+
+
+class AuthBusyError(Exception):
+    """Trop de requêtes d'authentification en attente : la demande est refusée."""
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def check_scrypt_params(n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    """Lève ValueError (message explicite) si les paramètres scrypt sont invalides."""
+    if n < 2 or n & (n - 1):
+        raise ValueError(f"CYBER_SCRYPT_N={n} invalide : une puissance de 2 supérieure à 1 est attendue (ex. 16384).")
+    if r < 1 or p < 1 or r * p >= 2 ** 30:
+        raise ValueError(f"Paramètres scrypt invalides : r={r}, p={p}.")
+
+
+def _maxmem(n, r, p):
+    # Mémoire utilisée par scrypt (128·r·N octets, plus les blocs de travail) et une marge :
+    # sans ce plafond explicite, OpenSSL refuse au-delà de 32 Mio (N = 32768 avec r = 8)
+    return 128 * r * (n + p) + 1024 * 1024
+
+
+def hash_password(password, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    salt = os.urandom(SALT_BYTES)
+    key = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=_maxmem(n, r, p), dklen=KEY_BYTES)
+    return f"scrypt${n}${r}${p}${_b64(salt)}${_b64(key)}"
+
+
+def verify_password(password, stored):
+    """Retourne (valide, à_rehacher)."""
+    if _LEGACY_SHA256.match(stored):
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, stored), True
+    parts = stored.split("$")
+    if len(parts) != 6 or parts[0] != "scrypt":
+        return False, False
+    _, n, r, p, salt, key = parts
+    n, r, p = int(n), int(r), int(p)
+    expected = base64.b64decode(key)
+    candidate = hashlib.scrypt(password.encode(), salt=base64.b64decode(salt), n=n, r=r, p=p,
+                               maxmem=_maxmem(n, r, p), dklen=len(expected))
+    return hmac.compare_digest(candidate, expected), (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+class AuthService:
+    def __init__(self, workers=AUTH_WORKERS, max_pending=AUTH_MAX_PENDING, timeout=AUTH_TIMEOUT):
+        # Configuration vérifiée au démarrage, avant le premier hachage (hash factice ci-dessous)
+        check_scrypt_params()
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="auth")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._dummy_hash = hash_password(os.urandom(8).hex())
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.total_work = 0.0
+        self.max_wait = 0.0
+
+    def _run(self, fn, *args):
+        """Soumet `fn` au pool et retourne le Future ; refuse si la file d'attente est pleine."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise AuthBusyError("Service d'authentification saturé, réessayez.")
+        submitted = time.perf_counter()
+        with self._lock:
+            self.pending += 1
+
+        def task():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    self.pending -= 1
+                    self.completed += 1
+                    self.total_wait += started - submitted
+                    self.total_work += finished - started
+                    self.max_wait = max(self.max_wait, started - submitted)
+                self._slots.release()
+
+        return self._pool.submit(task)
+
+    def _call(self, fn, *args):
+        """Exécute `fn` dans le pool et attend le résultat ; AuthBusyError si la file ne s'écoule pas à temps."""
+        future = self._run(fn, *args)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            # Tâche pas encore démarrée : retirée de la file, sa place est libérée
+            if future.cancel():
+                with self._lock:
+                    self.pending -= 1
+                    self.rejected += 1
+                self._slots.release()
+            raise AuthBusyError("Service d'authentification saturé, réessayez.") from None
+
+    def create_user(self, username, password):
+        if not is_valid_email(username):
+            return "EMAIL_INVALID"
+        hashed_pw = self._call(hash_password, password)
+        with db.connection() as conn:
+            try:
+                with conn:
+                    conn.execute('INSERT INTO users (username, password) VALUES (?, ?)', (username, hashed_pw))
+                return "SUCCESS"
+            except sqlite3.IntegrityError:
+                return "EXISTS"
+
+    def check_user(self, username, password):
+        with db.connection() as conn:
+            row = conn.execute('SELECT password FROM users WHERE username = ?', (username,)).fetchone()
+        # Compte inconnu : on vérifie quand même un hash factice (temps de réponse constant)
+        stored = row[0] if row is not None else self._dummy_hash
+        valid, needs_rehash = self._call(verify_password, password, stored)
+        if row is None:
+            return False
+        if valid and needs_rehash:
+            try:
+                self._run(self._rehash, username, password, stored)
+            except AuthBusyError:
+                pass  # migration reportée à la prochaine connexion
+        return valid
+
+    def _rehash(self, username, password, old_hash):
+        new_hash = hash_password(password)
+        with db.connection() as conn:
+            with conn:
+                # Condition sur l'ancien hash : pas d'écrasement d'un changement concurrent
+                conn.execute('UPDATE users SET password = ? WHERE username = ? AND password = ?',
+                             (new_hash, username, old_hash))
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": 1000 * self.total_wait / self.completed if self.completed else 0.0,
+                "max_wait_ms": 1000 * self.max_wait,
+                "avg_work_ms": 1000 * self.total_work / self.completed if self.completed else 0.0,
+            }
+
+
+def is_valid_email(email):
+    return _EMAIL.match(email)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service():
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = AuthService()
+    return _service
+
+
+@metrics.AUTH_CREATE.timed
+def create_user(username, password):
+    return get_service().create_user(username, password)
+
+
+@metrics.AUTH_CHECK.timed
+def check_user(username, password):
+    return get_service().check_user(username, password)
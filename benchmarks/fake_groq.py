@@ -0,0 +1,130 @@
+# --- FAUX SERVEUR GROQ LOCAL ---
+# Imite l'endpoint de streaming compatible OpenAI de Groq
+# (POST /openai/v1/chat/completions, Server-Sent Events) avec une latence
+# avant le premier token et un débit de tokens configurables. Sert aux
+# benchmarks et aux essais hors ligne (GROQ_BASE_URL=http://127.0.0.1:<port>).
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("Analyse", " du", " vecteur", " d'attaque", " :", " durcissement", " SSH,", " rotation",
+         " des", " clés,", " segmentation", " réseau", " et", " supervision", " SIEM.")
+
+
+class FakeGroqServer:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.2, tokens_per_second=200.0,
+                 response_tokens=60, rate_limit_every=0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.rate_limit_every = rate_limit_every
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-groq", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_chunk(self, payload):
+                data = f"data: {payload}\n\n".encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with server._lock:
+                    server.requests += 1
+                    throttled = server.rate_limit_every and server.requests % server.rate_limit_every == 0
+                if throttled:
+                    error = json.dumps({"error": {"message": "Rate limit reached", "type": "tokens"}}).encode()
+                    self.send_response(429)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(error)))
+                    self.send_header("Retry-After", "0.1")
+                    self.end_headers()
+                    self.wfile.write(error)
+                    return
+
+                model = body.get("model", "fake-model")
+                prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                time.sleep(server.latency)
+                delay = 1.0 / server.tokens_per_second if server.tokens_per_second else 0
+                try:
+                    for i in range(server.response_tokens):
+                        self._send_chunk(json.dumps({
+                            "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                            "model": model,
+                            "choices": [{"index": 0, "delta": {"content": WORDS[i % len(WORDS)]}, "finish_reason": None}],
+                        }))
+                        if delay:
+                            time.sleep(delay)
+                    self._send_chunk(json.dumps({
+                        "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                        "x_groq": {"usage": {"prompt_tokens": prompt_tokens,
+                                             "completion_tokens": server.response_tokens,
+                                             "total_tokens": prompt_tokens + server.response_tokens}},
+                    }))
+                    self._send_chunk("[DONE]")
+                    self.wfile.write(b"0\r\n\r\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # client parti (génération annulée)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Faux serveur Groq (streaming) pour tests hors ligne.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="délai avant le premier token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--response-tokens", type=int, default=60)
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="répond 429 toutes les N requêtes")
+    args = parser.parse_args()
+    server = FakeGroqServer(port=args.port, latency=args.latency, tokens_per_second=args.tokens_per_second,
+                            response_tokens=args.response_tokens, rate_limit_every=args.rate_limit_every)
+    print(f"Faux Groq en écoute sur {server.base_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+# --- SUITE DE BENCHMARKS HEADLESS ---
+# Lance l'application sans navigateur (streamlit.testing AppTest) contre un
+# faux serveur Groq local, et mesure :
+#   - la latence d'un rerun selon la longueur de l'historique,
+#   - le temps jusqu'au premier token (client direct et tour de chat complet),
+#   - le débit d'authentification (create_user / check_user),
+#   - le débit d'ingestion par type de fichier.
+# Les résultats sont écrits en JSON ; --baseline compare à un run précédent.
+#
+#   python benchmarks/run.py --output bench.json
+#   python benchmarks/run.py --baseline bench.json --tolerance 0.2
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "cyber_advisor.py")
+
+
+def _configure_environment(workdir, base_url):
+    # Avant tout import des modules de l'app : ils lisent leur configuration à l'import
+    os.environ["CYBER_DB_PATH"] = os.path.join(workdir, "users.db")
+    os.environ["CYBER_PDF_CACHE_DIR"] = os.path.join(workdir, "pdf_pages")
+    os.environ["GROQ_BASE_URL"] = base_url
+    os.environ.setdefault("CYBER_GROQ_RPM", "100000")
+    os.environ.setdefault("CYBER_GROQ_TPM", "100000000")
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def _app(username="bench@cybersentinel.com"):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    at.secrets["GROQ_API_KEY"] = "bench-key"
+    at.session_state.authenticated = True
+    at.session_state.username = username
+    return at
+
+
+def bench_rerun(history_lengths, repeats):
+    results = {}
+    for length in history_lengths:
+        at = _app()
+        at.run()
+        system = at.session_state.messages[0]
+        at.session_state.messages = [system] + [
+            {"id": i + 1, "role": "user" if i % 2 == 0 else "assistant",
+             "content": f"Message {i} : analyse du flux réseau, segment VLAN {i % 12}."}
+            for i in range(length)
+        ]
+        at.run()
+        samples = [_timed(at.run)[0] for _ in range(repeats)]
+        results[str(length)] = {"median_ms": 1000 * statistics.median(samples)}
+    return results
+
+
+def bench_ttft(base_url, prompts):
+    import llm
+    client = llm.get_client("bench-key", base_url=base_url)
+    samples = []
+    for i in range(prompts):
+        start = time.perf_counter()
+        stream = client.chat.completions.create(
+            model="llama-3.3-70b-versatile", stream=True,
+            messages=[{"role": "user", "content": f"Question de benchmark n°{i}"}],
+        )
+        first = None
+        for chunk in stream:
+            if first is None and chunk.choices and chunk.choices[0].delta.content:
+                first = time.perf_counter() - start
+        samples.append(first)
+
+    at = _app()
+    at.run()
+    turns = []
+    for i in range(prompts):
+        # Prompts uniques : aucun hit du cache de réponses
+        turns.append(_timed(lambda: at.chat_input[0].set_value(f"Durcissement SSH, variante {i} ?").run())[0])
+    return {
+        "client_first_ms": 1000 * samples[0],
+        "client_median_ms": 1000 * statistics.median(samples[1:] or samples),
+        "chat_turn_median_ms": 1000 * statistics.median(turns),
+    }
+
+
+def bench_auth(users, concurrency):
+    import auth
+    import db
+    db.init_db()
+    names = [f"agent{i}-{time.time_ns()}@bench.local" for i in range(users)]
+    with ThreadPoolExecutor(concurrency) as pool:
+        create_s, created = _timed(lambda: list(pool.map(lambda n: auth.create_user(n, "Passw0rd!"), names)))
+        check_s, checked = _timed(lambda: list(pool.map(lambda n: auth.check_user(n, "Passw0rd!"), names)))
+    assert all(status == "SUCCESS" for status in created) and all(checked)
+    return {
+        "create_user_per_s": users / create_s,
+        "check_user_per_s": users / check_s,
+        "concurrency": concurrency,
+        "service": auth.get_service().metrics(),
+    }
+
+
+def bench_ingestion(lines, workdir):
+    import analysis
+    import archives
+    import ingestion
+    import retrieval
+    from benchmarks import samples
+
+    datasets = {
+        "log": ("auth.log", samples.auth_log(lines)),
+        "csv": ("access.csv", samples.access_csv(lines)),
+        "txt": ("notes.txt", samples.notes_txt(lines)),
+        "pdf": ("report.pdf", samples.report_pdf(max(10, lines // 2000))),
+        "zip": ("evidence.zip", samples.evidence_zip(lines // 4)),
+    }
+    results = {}
+    for kind, (name, data) in datasets.items():
+        shutil.rmtree(os.environ["CYBER_PDF_CACHE_DIR"], ignore_errors=True)
+        index = retrieval.BM25Index()
+
+        def run():
+            ingested = ingestion.IngestedFile.from_stream(io.BytesIO(data), name)
+            try:
+                if kind == "zip":
+                    with ingested.open() as fileobj:
+                        return list(archives.iter_zip_results(fileobj, index=index))
+                return analysis.analyze_ingested(ingested, index=index)
+            finally:
+                ingested.close()
+
+        seconds, _ = _timed(run)
+        results[kind] = {"bytes": len(data), "seconds": seconds,
+                         "mb_per_s": len(data) / seconds / 1e6, "chunks_indexed": len(index)}
+    return results
+
+
+def compare(current, baseline, tolerance, path=""):
+    """Liste des régressions : *_ms plus lents ou *_per_s / mb_per_s plus faibles que la tolérance."""
+    regressions = []
+    for key, value in current.items():
+        ref = baseline.get(key) if isinstance(baseline, dict) else None
+        name = f"{path}.{key}" if path else key
+        if isinstance(value, dict):
+            regressions += compare(value, ref or {}, tolerance, name)
+        elif isinstance(value, (int, float)) and isinstance(ref, (int, float)) and ref:
+            change = (value - ref) / ref
+            if key.endswith("_ms") and change > tolerance:
+                regressions.append(f"{name}: {ref:.2f} -> {value:.2f} (+{change:.0%})")
+            elif key.endswith("_per_s") and change < -tolerance:
+                regressions.append(f"{name}: {ref:.2f} -> {value:.2f} ({change:.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks headless de Cyber-Sentinel.")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="résultats JSON précédents à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="dégradation relative tolérée")
+    parser.add_argument("--latency", type=float, default=0.2, help="latence du faux Groq avant le premier token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=300.0)
+    parser.add_argument("--history", default="0,50,200,1000", help="longueurs d'historique à mesurer")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--prompts", type=int, default=5)
+    parser.add_argument("--auth-users", type=int, default=40)
+    parser.add_argument("--auth-concurrency", type=int, default=8)
+    parser.add_argument("--ingest-lines", type=int, default=200000)
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, ROOT)
+    from benchmarks.fake_groq import FakeGroqServer
+
+    workdir = tempfile.mkdtemp(prefix="cyber_bench_")
+    try:
+        with FakeGroqServer(latency=args.latency, tokens_per_second=args.tokens_per_second) as server:
+            _configure_environment(workdir, server.base_url)
+            results = {
+                "meta": {
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "fake_latency_s": args.latency,
+                    "fake_tokens_per_second": args.tokens_per_second,
+                },
+                "rerun_latency": bench_rerun([int(n) for n in args.history.split(",")], args.repeats),
+                "ttft": bench_ttft(server.base_url, args.prompts),
+                "auth": bench_auth(args.auth_users, args.auth_concurrency),
+                "ingestion": bench_ingestion(args.ingest_lines, workdir),
+            }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"RÉGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
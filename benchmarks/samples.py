@@ -0,0 +1,71 @@
+# --- JEUX DE DONNÉES SYNTHÉTIQUES POUR LES BENCHMARKS ---
+import io
+import random
+import zipfile
+
+
+def auth_log(lines, seed=0):
+    rng = random.Random(seed)
+    out = []
+    for i in range(lines):
+        ip = f"10.{rng.randrange(4)}.{rng.randrange(256)}.{rng.randrange(256)}"
+        hour = 10 + i * 12 // lines
+        if rng.random() < 0.3:
+            out.append(f"Mar  3 {hour:02d}:15:22 bastion sshd[{rng.randrange(99999)}]: "
+                       f"Failed password for invalid user admin{rng.randrange(50)} from {ip} port 22 ssh2")
+        else:
+            out.append(f"Mar  3 {hour:02d}:16:02 bastion sshd[{rng.randrange(99999)}]: "
+                       f"Accepted publickey for deploy from {ip} port 22 ssh2")
+    return ("\n".join(out) + "\n").encode()
+
+
+def access_csv(rows, seed=0):
+    rng = random.Random(seed)
+    agents = ["Mozilla/5.0", "curl/8.4.0", "python-requests/2.31", "sqlmap/1.7"]
+    out = ["timestamp,src_ip,status,user_agent,path"]
+    for i in range(rows):
+        out.append(f"2024-03-01T{10 + i * 12 // rows:02d}:00:{rng.randrange(60):02d}Z,"
+                   f"192.168.{rng.randrange(8)}.{rng.randrange(256)},"
+                   f"{rng.choice((200, 200, 200, 302, 401, 403, 404, 500))},"
+                   f"{rng.choice(agents)},/login")
+    return ("\n".join(out) + "\n").encode()
+
+
+def notes_txt(lines, seed=0):
+    rng = random.Random(seed)
+    words = ["pare-feu", "VLAN", "CVE-2024-3094", "EDR", "durcissement", "SSH", "Kerberos", "LDAP", "patch"]
+    return ("\n".join(" ".join(rng.choice(words) for _ in range(12)) for _ in range(lines)) + "\n").encode()
+
+
+def report_pdf(pages):
+    """PDF minimal (une ligne de texte Helvetica par page), sans dépendance."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>"]
+    font_ref = 3 + 2 * pages
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(pages))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>")
+    for i in range(pages):
+        stream = f"BT /F1 12 Tf 72 720 Td (Rapport d'incident page {i} CVE-2024-{1000 + i} hote srv{i % 7}) Tj ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+                       f"/Resources << /Font << /F1 {font_ref} 0 R >> >> >>")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    out = "%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    return out.encode("latin-1")
+
+
+def evidence_zip(lines, seed=0):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("logs/auth.log", auth_log(lines, seed))
+        archive.writestr("web/access.csv", access_csv(lines, seed))
+        archive.writestr("notes/notes.txt", notes_txt(lines // 10, seed))
+        archive.writestr("reports/report.pdf", report_pdf(20))
+    return buffer.getvalue()
@@ -0,0 +1,44 @@
+# --- DÉMARRAGE UNIQUE PAR PROCESS ---
+# Streamlit réexécute le script à chaque interaction, mais les modules importés
+# restent en mémoire : tout ce qui ne dépend pas de la session (migrations,
+# endpoint de métriques, lecture des assets) est fait ici une seule fois.
+import os
+import threading
+
+import db
+import history
+import metrics
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+# Servi par Streamlit (server.enableStaticServing) sous /app/static/ : le
+# navigateur le met en cache, aucune requête vers un CDN externe.
+BANNER_URL = "app/static/banner.png"
+STYLESHEET_URL = "app/static/style.css"
+
+_done = False
+_lock = threading.Lock()
+_stylesheet = None
+
+
+def run_once():
+    """Migrations et services de fond ; no-op après le premier appel du process."""
+    global _done
+    if _done:
+        return
+    with _lock:
+        if not _done:
+            db.init_db()
+            history.init_history()
+            metrics.start_http_server()
+            _done = True
+
+
+def stylesheet():
+    """Balise <link> vers static/style.css : le navigateur charge et met en cache la feuille,
+    chaque rerun n'envoie que la balise. La date de modification sert de version (cache invalidé
+    au déploiement d'une nouvelle feuille)."""
+    global _stylesheet
+    if _stylesheet is None:
+        version = os.stat(os.path.join(STATIC_DIR, "style.css")).st_mtime_ns
+        _stylesheet = f'<link rel="stylesheet" href="{STYLESHEET_URL}?v={version}">'
+    return _stylesheet
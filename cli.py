@@ -0,0 +1,237 @@
+# --- ANALYSE PAR LOTS EN LIGNE DE COMMANDE ---
+# Même pipeline que l'interface, sans Streamlit : chaque fichier preuve est
+# résumé localement (digest + IOC, analysis.py / archives.py) par un pool de
+# process, puis le digest part vers le modèle via l'ordonnanceur partagé
+# (quotas, réessais) avec un nombre borné d'appels simultanés. Un résultat JSON
+# par ligne ; le fichier de sortie sert aussi de point de reprise : un lot
+# interrompu repart là où il s'était arrêté.
+#
+#   python cli.py /var/log/nightly --output triage.jsonl
+#   python cli.py "preuves/**/*.log" --output triage.jsonl --no-model
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import analysis
+import archives
+import ingestion
+import llm
+import pdf_extract
+import router
+from completion import Completion
+from context import SYSTEM_PROMPT, ContextWindow, fit_pinned
+
+CLI_WORKERS = int(os.environ.get("CYBER_CLI_WORKERS", str(os.cpu_count() or 2)))
+CLI_CONCURRENCY = int(os.environ.get("CYBER_CLI_CONCURRENCY", "4"))
+# File d'attente propre au lot dans l'ordonnanceur (équité vis-à-vis des agents)
+CLI_USER = "cli"
+BATCH_PROMPT = ("Analyse cette preuve : résume les activités suspectes, les indicateurs de compromission "
+                "notables et les actions de remédiation recommandées.")
+SUPPORTED_TYPES = analysis.SUPPORTED_TYPES | {"zip"}
+SECRETS_PATH = os.path.join(".streamlit", "secrets.toml")
+
+
+# --- Fichiers à traiter ---
+def find_files(inputs):
+    """Fichiers pris en charge désignés par des dossiers (parcourus récursivement) ou des motifs glob."""
+    found = []
+    for entry in inputs:
+        if os.path.isdir(entry):
+            paths = (os.path.join(root, name) for root, _, names in os.walk(entry) for name in names)
+        else:
+            paths = glob.glob(entry, recursive=True)
+        found.extend(path for path in paths
+                     if os.path.isfile(path) and os.path.splitext(path)[1].lower().lstrip(".") in SUPPORTED_TYPES)
+    # Ordre stable d'un lancement à l'autre, sans doublons
+    return sorted({os.path.abspath(path) for path in found})
+
+
+def fingerprint(path):
+    """Taille et date de modification : un fichier modifié depuis est retraité."""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def load_checkpoint(output):
+    """{chemin: empreinte} des fichiers déjà traités avec succès dans `output`.
+
+    Une dernière ligne incomplète (lot tué pendant l'écriture) est retirée.
+    """
+    done = {}
+    try:
+        f = open(output, "r+b")
+    except FileNotFoundError:
+        return done
+    with f:
+        valid = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            valid += len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            # Un échec n'est pas un point de reprise : le fichier sera retenté
+            if record.get("status") == "ok":
+                done[record["path"]] = record.get("fingerprint")
+            else:
+                done.pop(record.get("path"), None)
+        f.truncate(valid)
+    return done
+
+
+# --- Analyse locale (dans un process du pool) ---
+def _init_worker():
+    # Le lot est déjà réparti sur les cœurs : pas de pool PDF imbriqué dans chaque process
+    pdf_extract.PDF_MAX_WORKERS = 1
+
+
+def analyze_path(path):
+    """Digest et IOC d'un fichier, sans appel au modèle."""
+    ingested = ingestion.IngestedFile.from_path(path)
+    try:
+        if ingested.extension != "zip":
+            result = analysis.analyze_ingested(ingested)
+            return {key: result[key] for key in ("lines", "pages", "digest", "iocs") if key in result}
+        with ingested.open() as fileobj:
+            members = list(archives.iter_zip_results(fileobj, max_workers=1))
+        return {
+            "members": [{key: member[key] for key in ("name", "status", "lines", "detail") if key in member}
+                        for member in members],
+            # Digests des membres dans le budget épinglé, comme dans l'interface
+            "digest": "\n".join(fit_pinned(member.get("digest") for member in members)) or None,
+            "iocs": [dict(row, membre=member["name"]) for member in members for row in member.get("iocs", ())],
+        }
+    finally:
+        ingested.close()
+
+
+# --- Appel au modèle (dans un thread, nombre borné) ---
+def ask_model(client, digest, prompt=BATCH_PROMPT, model=None):
+    """Réponse du modèle pour un digest : (modèle, texte, servi depuis le cache ?)."""
+    model = model or router.get_router().choose(prompt, has_evidence=True)
+    context = ContextWindow().build([SYSTEM_PROMPT, {"role": "user", "content": prompt}], pinned=[digest])
+    # Le lot est comptabilisé (et soumis au quota) comme un agent nommé CLI_USER
+    completion = Completion(client, CLI_USER, model, context)
+    with completion:
+        response = "".join(completion.stream())
+    return model, response, completion.cached is not None
+
+
+def get_api_key():
+    """GROQ_API_KEY de l'environnement, sinon celle de .streamlit/secrets.toml (comme l'interface)."""
+    api_key = os.environ.get("GROQ_API_KEY")
+    if api_key or not os.path.exists(SECRETS_PATH):
+        return api_key
+    import tomllib
+    with open(SECRETS_PATH, "rb") as f:
+        return tomllib.load(f).get("GROQ_API_KEY")
+
+
+# --- Orchestration ---
+def run_batch(paths, output, workers=CLI_WORKERS, concurrency=CLI_CONCURRENCY, client=None,
+              prompt=BATCH_PROMPT, model=None, log=None):
+    """Traite `paths` et ajoute un résultat par fichier à `output` ; retourne le nombre d'échecs.
+
+    Sans `client`, seule l'analyse locale est faite (digest et IOC, sans réponse du modèle).
+    """
+    done = load_checkpoint(output)
+    todo = [path for path in paths if done.get(path) != fingerprint(path)]
+    if log:
+        log(f"{len(paths)} fichiers, {len(paths) - len(todo)} déjà traités, {len(todo)} à traiter")
+    failures = 0
+    finished = 0
+    with open(output, "a", encoding="utf-8") as out, \
+            ProcessPoolExecutor(max_workers=max(1, workers),
+                                # "spawn" : pas de fork d'un process multi-threadé
+                                mp_context=multiprocessing.get_context("spawn"),
+                                initializer=_init_worker) as analyzers, \
+            ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="cli-model") as callers:
+
+        def write(record):
+            nonlocal failures, finished
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            # Le résultat est sur disque avant d'être compté comme point de reprise
+            out.flush()
+            os.fsync(out.fileno())
+            finished += 1
+            failures += record["status"] != "ok"
+            if log:
+                log(f"[{finished}/{len(todo)}] {record['path']} : {record['status']}"
+                    + (f" ({record['detail']})" if record.get("detail") else ""))
+
+        # future -> (étape, résultat partiel)
+        pending = {}
+        for path in todo:
+            record = {"path": path, "fingerprint": fingerprint(path), "started": time.time()}
+            pending[analyzers.submit(analyze_path, path)] = ("analysis", record)
+        try:
+            while pending:
+                ready, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in ready:
+                    stage, record = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        record.update(status="error", stage=stage, detail=str(e) or type(e).__name__)
+                        write(_finish(record))
+                        continue
+                    if stage == "analysis":
+                        record.update(result)
+                        if client is not None and record.get("digest"):
+                            pending[callers.submit(ask_model, client, record["digest"], prompt, model)] = ("model", record)
+                            continue
+                    else:
+                        record["model"], record["response"], record["cached"] = result
+                    record["status"] = "ok"
+                    write(_finish(record))
+        finally:
+            # Interruption (Ctrl+C) : rien n'est lancé de plus, la reprise refera le reste
+            for future in pending:
+                future.cancel()
+    return failures
+
+
+def _finish(record):
+    record["elapsed"] = round(time.time() - record.pop("started"), 3)
+    return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse par lots des preuves de Cyber-Sentinel.")
+    parser.add_argument("inputs", nargs="+", help="dossiers ou motifs glob (ex. 'logs/**/*.log')")
+    parser.add_argument("--output", "-o", required=True, help="fichier JSONL des résultats (et point de reprise)")
+    parser.add_argument("--workers", type=int, default=CLI_WORKERS, help="process d'analyse locale")
+    parser.add_argument("--concurrency", type=int, default=CLI_CONCURRENCY, help="appels au modèle simultanés")
+    parser.add_argument("--prompt", default=BATCH_PROMPT)
+    parser.add_argument("--model", help="modèle imposé (par défaut : choix du routeur)")
+    parser.add_argument("--no-model", action="store_true", help="digest et IOC seulement, sans appel au modèle")
+    args = parser.parse_args(argv)
+
+    client = None
+    if not args.no_model:
+        api_key = get_api_key()
+        if not api_key:
+            parser.error("clé d'API Groq absente (GROQ_API_KEY ou .streamlit/secrets.toml), ou --no-model")
+        client = llm.get_client(api_key)
+
+    paths = find_files(args.inputs)
+    try:
+        failures = run_batch(paths, args.output, args.workers, args.concurrency, client,
+                             args.prompt, args.model, log=lambda text: print(text, file=sys.stderr))
+    except KeyboardInterrupt:
+        print("Interrompu : relancer la même commande pour reprendre.", file=sys.stderr)
+        return 130
+    finally:
+        llm.close_clients()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+# --- APPEL AU MODÈLE ---
+# Chemin commun à l'interface et au traitement par lots (cli.py), une fois le
+# contexte construit : cache des réponses, quota journalier de l'agent,
+# passage par l'ordonnanceur (file, réessais), mesure TTFT / débit pour le
+# routeur, puis comptabilité des tokens réellement facturés.
+import metrics
+import response_cache
+import router
+import scheduler
+import streaming
+import usage
+from context import count_tokens
+
+
+class Completion:
+    """Une requête au modèle ; à utiliser en contexte (`with`) autour de la lecture du flux.
+
+    `cached` : réponse déjà connue (aucun appel réseau à faire), sinon None.
+    À la sortie du bloc, un flux inachevé est fermé, les tokens sont comptés
+    pour l'agent et la réponse complète est mise en cache.
+    """
+
+    def __init__(self, client, user, model, context):
+        self.client = client
+        self.user = user
+        self.model = model
+        self.context = context
+        self.cache = response_cache.get_cache()
+        self.cache_key = response_cache.make_key(model, context)
+        self.cached = self.cache.get(self.cache_key)
+        self.prompt_estimate = sum(count_tokens(m["content"]) for m in context)
+        self.estimate = self.prompt_estimate + scheduler.COMPLETION_TOKEN_ESTIMATE
+        self.generation = None
+        self.reservation = None
+
+    def stream(self, on_wait=None, on_retry=None):
+        """Texte de la réponse au fil du flux (rejoué depuis le cache si elle y est)."""
+        if self.cached is not None:
+            return response_cache.replay(self.cached)
+        # Quota journalier de l'agent vérifié avant tout appel réseau (usage.QuotaExceeded)
+        self.reservation = usage.get_tracker().check(self.user, self.estimate)
+        timer = router.StreamTimer(router.get_router(), self.model)
+
+        def create_completion():
+            # TTFT mesuré depuis l'envoi : ni file d'attente ni pauses entre réessais
+            timer.start()
+            with metrics.LLM_REQUEST.time(model=self.model):
+                return self.client.chat.completions.create(model=self.model, messages=self.context, stream=True)
+
+        try:
+            stream = scheduler.get_scheduler().run(self.user, self.estimate, create_completion,
+                                                   on_wait=on_wait, on_retry=on_retry)
+        except Exception:
+            router.get_router().record_error(self.model)
+            raise
+        self.generation = streaming.Generation(stream)
+        return timer.wrap(self.generation.iter_text())
+
+    @property
+    def truncated_text(self):
+        """Réponse partielle d'un flux interrompu (stop, rerun, erreur), sinon None."""
+        if self.generation is None or self.generation.finished:
+            return None
+        return self.generation.text or None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        generation = self.generation
+        if generation is None:
+            # Pas de réponse (file d'attente abandonnée, erreur) : la réservation du quota est rendue
+            usage.get_tracker().release(self.reservation)
+            return False
+        generation.cancel()
+        # Tokens facturés à l'agent (réponse complète ou partielle) ; la réservation
+        # de l'ordonnanceur est corrigée avec la consommation réelle
+        prompt_tokens, completion_tokens = usage.token_counts(generation, self.prompt_estimate)
+        usage.get_tracker().record(self.user, prompt_tokens, completion_tokens, self.reservation)
+        scheduler.get_scheduler().adjust_tokens(prompt_tokens + completion_tokens - self.estimate)
+        if generation.finished and exc_type is None:
+            self.cache.put(self.cache_key, generation.text)
+        return False
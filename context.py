@@ -0,0 +1,118 @@
+# --- FENÊTRE DE CONTEXTE À BUDGET DE TOKENS ---
+# Au lieu d'envoyer tout l'historique à chaque tour, on garde le prompt système,
+# une fenêtre glissante des derniers messages qui tient dans le budget, et un
+# résumé roulant des tours plus anciens. La taille des requêtes reste bornée
+# quelle que soit la durée de la session.
+import math
+import os
+from functools import lru_cache
+
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CYBER_CONTEXT_TOKEN_BUDGET", "6000"))
+SUMMARY_TOKEN_BUDGET = int(os.environ.get("CYBER_SUMMARY_TOKEN_BUDGET", "800"))
+# Part du budget réservée aux textes épinglés (digests, extraits, IOC connus)
+PINNED_TOKEN_BUDGET = int(os.environ.get("CYBER_PINNED_TOKEN_BUDGET", str(CONTEXT_TOKEN_BUDGET // 2)))
+CHARS_PER_TOKEN = 3.5
+MESSAGE_OVERHEAD = 4
+SUMMARY_LINE_CHARS = 200
+
+ROLE_LABELS = {"user": "Agent", "assistant": "Assistant"}
+# Prompt système commun à l'interface et au traitement par lots (cli.py)
+SYSTEM_PROMPT = {"role": "system", "content": "Tu es un expert senior en cybersécurité (SISR). Réponds de manière technique, concise et professionnelle. Utilise du markdown pour formater tes réponses."}
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text):
+    """Estimation locale (sans tokenizer) du nombre de tokens d'un texte, mise en cache."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) + MESSAGE_OVERHEAD
+
+
+def _summary_line(msg):
+    first_line = msg["content"].strip().splitlines()[0] if msg["content"].strip() else ""
+    if len(first_line) > SUMMARY_LINE_CHARS:
+        first_line = first_line[:SUMMARY_LINE_CHARS].rstrip() + "…"
+    return f"- {ROLE_LABELS.get(msg['role'], msg['role'])} : {first_line}"
+
+
+def fit_pinned(texts, budget=PINNED_TOKEN_BUDGET):
+    """Textes retenus, par ordre de priorité, dans `budget` tokens ; le premier qui déborde est tronqué."""
+    kept = []
+    used = 0
+    for text in texts:
+        if not text:
+            continue
+        cost = count_tokens(text)
+        if used + cost <= budget:
+            kept.append(text)
+            used += cost
+            continue
+        room = int((budget - used - MESSAGE_OVERHEAD) * CHARS_PER_TOKEN) - 1
+        if room > 0:
+            kept.append(text[:room].rstrip() + "…")
+        break
+    return kept
+
+
+class ContextWindow:
+    """Construit la liste de messages envoyée au modèle, dans un budget de tokens.
+
+    L'instance vit dans `st.session_state` : le résumé des tours sortis de la
+    fenêtre est enrichi incrémentalement, jamais recalculé depuis le début.
+    """
+
+    def __init__(self, budget=CONTEXT_TOKEN_BUDGET, summary_budget=SUMMARY_TOKEN_BUDGET,
+                 pinned_budget=PINNED_TOKEN_BUDGET):
+        self.budget = budget
+        self.summary_budget = summary_budget
+        self.pinned_budget = pinned_budget
+        self.summary_lines = []
+        self.folded_upto = 0  # index (dans l'historique) du premier message non résumé
+
+    def _fold(self, turns):
+        for msg in turns:
+            self.summary_lines.append(_summary_line(msg))
+        # Le résumé lui-même est borné : on oublie les lignes les plus anciennes
+        while self.summary_lines and count_tokens("\n".join(self.summary_lines)) > self.summary_budget:
+            self.summary_lines.pop(0)
+
+    def summary_message(self):
+        if not self.summary_lines:
+            return None
+        return {
+            "role": "system",
+            "content": "Résumé des échanges précédents de la session :\n" + "\n".join(self.summary_lines),
+        }
+
+    def build(self, messages, pinned=()):
+        """`pinned` : textes envoyés après le prompt système (digests de preuves...), par priorité
+        décroissante ; seuls ceux qui tiennent dans `pinned_budget` sont gardés."""
+        head = [m for m in messages[:1] if m["role"] == "system"]
+        turns = messages[len(head):]
+        system = head + [{"role": "system", "content": text} for text in fit_pinned(pinned, self.pinned_budget)]
+        if len(turns) < self.folded_upto:
+            # Historique réinitialisé (nouvelle conversation) : on repart de zéro
+            self.summary_lines = []
+            self.folded_upto = 0
+
+        available = max(0, self.budget - sum(count_tokens(m["content"]) for m in system) - self.summary_budget)
+        start = len(turns)
+        used = 0
+        while start > 0:
+            cost = count_tokens(turns[start - 1]["content"])
+            # Le dernier message est toujours envoyé, même s'il dépasse le budget
+            if used + cost > available and start < len(turns):
+                break
+            used += cost
+            start -= 1
+
+        # Un tour déjà résumé n'est jamais renvoyé en entier
+        start = max(start, self.folded_upto)
+        if start > self.folded_upto:
+            self._fold(turns[self.folded_upto:start])
+            self.folded_upto = start
+
+        window = [{"role": m["role"], "content": m["content"]} for m in system]
+        summary = self.summary_message()
+        if summary is not None:
+            window.append(summary)
+        window.extend({"role": m["role"], "content": m["content"]} for m in turns[start:])
+        return window
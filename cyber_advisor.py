@@ -1,8 +1,30 @@
 import streamlit as st
-from groq import Groq
-import sqlite3
-import hashlib
-import re
+import html
+import os
+import time
+import zipfile
+import bootstrap
+import metrics
+import auth
+import llm
+import router
+import streaming
+import response_cache
+import upload_cache
+import usage
+import ingestion
+import analysis
+import archives
+import retrieval
+import history
+import ioc
+import intel
+import sessions
+import feedback
+from completion import Completion
+from context import SYSTEM_PROMPT, ContextWindow
+
+_rerun_started = time.perf_counter()
 
 # --- CONFIGURATION DU DESIGN (Layout) ---
 st.set_page_config(
@@ -13,189 +35,189 @@ st.set_page_config(
 )
 
 # --- CSS PERSONNALISÉ (LE GROS CHANGEMENT FRONT-END) ---
-# On injecte du CSS avancé pour un look Cyberpunk Premium
-custom_css = """
-    <style>
-    /* --- Masquer les éléments Streamlit par défaut --- */
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    header {visibility: hidden;}
-    
-    /* --- Fond Global Animé (Optionnel : si trop lourd, retirer le linear-gradient) --- */
-    .stApp {
-        background: linear-gradient(to bottom right, #0a0e17, #1a1f35);
-    }
-
-    /* --- TYPOGRAPHIE & TITRES --- */
-    h1, h2, h3 {
-        font-family: 'Helvetica Neue', sans-serif;
-        font-weight: 800;
-        letter-spacing: 1px;
-        color: #ffffff !important;
-        text-shadow: 0 0 10px rgba(0, 229, 255, 0.5); /* Effet Neon Glow */
-    }
-    
-    /* --- BOUTONS CYBER --- */
-    /* On cible tous les boutons pour leur donner un look futuriste */
-    .stButton > button {
-        width: 100%;
-        background: linear-gradient(45deg, #00c6ff, #0072ff);
-        border: none;
-        color: white;
-        padding: 12px 24px;
-        text-align: center;
-        text-decoration: none;
-        display: inline-block;
-        font-size: 16px;
-        font-weight: bold;
-        margin: 4px 2px;
-        transition-duration: 0.4s;
-        cursor: pointer;
-        border-radius: 8px;
-        box-shadow: 0 4px 15px rgba(0, 198, 255, 0.3);
-    }
-    
-    .stButton > button:hover {
-        background: linear-gradient(45deg, #0072ff, #00c6ff);
-        box-shadow: 0 0 20px rgba(0, 229, 255, 0.7); /* Lueur intense au survol */
-        transform: translateY(-2px);
-    }
-
-    /* --- CHAMPS DE SAISIE (INPUTS) --- */
-    /* Style "terminal" sombre avec bordure néon au focus */
-    .stTextInput > div > div > input, .stPasswordInput > div > div > input, .stTextArea > div > div > textarea {
-        background-color: #131c2e !important;
-        color: #00e5ff !important; /* Texte couleur cyan */
-        border: 1px solid #2c3e50;
-        border-radius: 5px;
-    }
-    
-    /* Quand on clique dans un champ */
-    .stTextInput > div > div > input:focus, .stPasswordInput > div > div > input:focus {
-        border-color: #00e5ff !important;
-        box-shadow: 0 0 10px rgba(0, 229, 255, 0.5);
-    }
-
-    /* --- SIDEBAR (Barre latérale) --- */
-    section[data-testid="stSidebar"] {
-        background-color: #0d1321;
-        border-right: 1px solid #1e2a3a;
-        box-shadow: 5px 0 15px rgba(0,0,0,0.3);
-    }
-
-    /* --- TABS (Onglets Connexion/Inscription) --- */
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 10px;
-        background-color: transparent;
-    }
-    
-    .stTabs [data-baseweb="tab"] {
-        height: 50px;
-        background-color: #131c2e;
-        border-radius: 8px;
-        color: #8892b0;
-        border: 1px solid transparent;
-        transition: all 0.3s ease;
-    }
-
-    .stTabs [aria-selected="true"] {
-        background-color: rgba(0, 229, 255, 0.1) !important;
-        color: #00e5ff !important;
-        border: 1px solid #00e5ff !important;
-        box-shadow: inset 0 0 10px rgba(0, 229, 255, 0.2);
-    }
-    
-    /* --- MESSAGES CHATBOT --- */
-    .stChatMessage {
-        background-color: rgba(19, 28, 46, 0.8);
-        border: 1px solid #2c3e50;
-        border-radius: 10px;
-        padding: 15px;
-    }
-    /* Différencier User et Assistant */
-    [data-testid="stChatMessageAvatarUser"] {
-        background-color: #0072ff;
-    }
-    [data-testid="stChatMessageAvatarAssistant"] {
-        background-color: #00e5ff;
-    }
-
-    </style>
-    """
-st.markdown(custom_css, unsafe_allow_html=True)
+# Look Cyberpunk Premium : feuille static/style.css servie en asset statique (cache navigateur)
+st.markdown(bootstrap.stylesheet(), unsafe_allow_html=True)
 
 # --- IDENTITÉ DU CRÉATEUR ---
 CREATOR_NAME = "Lionnel (Cyber-Expert)" 
 CREATOR_EMAIL = "contact@cybersentinel.com"
+# Agents autorisés à voir le panneau de télémétrie (emails séparés par des virgules)
+ADMIN_USERS = {u.strip() for u in os.environ.get("CYBER_ADMIN_USERS", "").split(",") if u.strip()}
 
-# --- GESTION DE LA BASE DE DONNÉES (Inchangé) ---
-def init_db():
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            username TEXT PRIMARY KEY,
-            password TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
-
-def is_valid_email(email):
-    pattern = r'^[\w\.-]+@[\w\.-]+\.\w+$'
-    return re.match(pattern, email)
-
-def create_user(username, password):
-    if not is_valid_email(username):
-        return "EMAIL_INVALID"
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
-    hashed_pw = hash_password(password)
-    try:
-        c.execute('INSERT INTO users (username, password) VALUES (?, ?)', (username, hashed_pw))
-        conn.commit()
-        return "SUCCESS"
-    except sqlite3.IntegrityError:
-        return "EXISTS"
-    finally:
-        conn.close()
-
-def check_user(username, password):
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
-    hashed_pw = hash_password(password)
-    c.execute('SELECT * FROM users WHERE username = ? AND password = ?', (username, hashed_pw))
-    result = c.fetchone()
-    conn.close()
-    return result is not None
-
-init_db()
+# --- GESTION DE LA BASE DE DONNÉES (pool partagé, voir db.py ; mots de passe : auth.py) ---
+# Migrations et endpoint Prometheus (/metrics) : une seule fois par process, no-op ensuite
+bootstrap.run_once()
 
 # --- GESTION DE L'ÉTAT (SESSION) (Inchangé) ---
 if "authenticated" not in st.session_state:
     st.session_state.authenticated = False
 if "username" not in st.session_state:
     st.session_state.username = ""
-if "messages" not in st.session_state:
-    st.session_state.messages = [
-        {"role": "system", "content": "Tu es un expert senior en cybersécurité (SISR). Réponds de manière technique, concise et professionnelle. Utilise du markdown pour formater tes réponses."}
-    ]
-if "feedbacks" not in st.session_state:
-    st.session_state.feedbacks = []
 
-def login_success(username):
+if "messages" not in st.session_state:
+    st.session_state.messages = [SYSTEM_PROMPT]
+if "older_messages" not in st.session_state:
+    # Pages anciennes chargées à la demande, uniquement pour l'affichage
+    st.session_state.older_messages = []
+if "visible_messages" not in st.session_state:
+    st.session_state.visible_messages = history.HISTORY_PAGE_SIZE
+if "context_window" not in st.session_state:
+    st.session_state.context_window = ContextWindow()
+if "session" not in st.session_state:
+    # Session partagée (sessions.py) : retrouvée par n'importe quel worker via le jeton de l'URL
+    st.session_state.session = None
+if "evidence_index" not in st.session_state:
+    st.session_state.evidence_index = retrieval.BM25Index()
+if "feedback_page" not in st.session_state:
+    st.session_state.feedback_page = 0
+
+def ingest_upload(uploaded_file):
+    # Un fichier n'est ingéré qu'une fois par session, pas à chaque rerun
+    current = st.session_state.get("ingested")
+    if current is not None and current["file_id"] == uploaded_file.file_id:
+        return current
+    if current is not None:
+        current["file"].close()
+    ingested = ingestion.IngestedFile.from_upload(uploaded_file)
+    stats = None
+    if ingested.extension == "zip":
+        stats = ingest_zip(ingested)
+    elif ingested.extension in analysis.SUPPORTED_TYPES:
+        # Même contenu déjà analysé (par n'importe quel agent) : résultats relus du cache disque.
+        # La version de la base de menaces fait partie de la clé (annotations [INTEL] à jour).
+        cache = upload_cache.get_cache()
+        artifact = ("analysis", ingested.name, intel.get_store().version)
+        cached = cache.get(ingested.sha256(), artifact)
+        if cached is None:
+            # Pré-agrégation locale : seul le digest compact part vers le modèle
+            progress = st.progress(0.0, text=f"Analyse de {ingested.name}...")
+            file_index = retrieval.BM25Index()
+            try:
+                stats = analysis.analyze_ingested(
+                    ingested, index=file_index,
+                    progress=lambda done, total: progress.progress(done / total, text=f"Pages extraites : {done}/{total}"),
+                )
+                cache.put(ingested.sha256(), artifact, {"stats": stats, "index": file_index})
+            except Exception as e:
+                # PDF corrompu ou chiffré, contenu illisible... : l'échec est affiché et le fichier
+                # compte comme ingéré, sans nouvelle tentative à chaque rerun
+                stats = {"error": str(e) or type(e).__name__}
+            finally:
+                progress.empty()
+        else:
+            stats, file_index = cached["stats"], cached["index"]
+        if "error" not in stats:
+            st.session_state.evidence_index.merge(file_index)
+            if stats["digest"]:
+                add_evidence(ingested.name, stats["digest"])
+                save_evidence()
+    st.session_state.ingested = {"file_id": uploaded_file.file_id, "file": ingested, "stats": stats}
+    return st.session_state.ingested
+
+def _zip_results(ingested, index):
+    with ingested.open() as fileobj:
+        yield from archives.iter_zip_results(fileobj, index=index)
+
+def ingest_zip(ingested):
+    # Membres traités en flux par le pool de workers, progression affichée membre par membre ;
+    # archive déjà traitée : les résultats des membres sont relus du cache disque
+    cache = upload_cache.get_cache()
+    artifact = ("zip", ingested.name, intel.get_store().version)
+    cached = cache.get(ingested.sha256(), artifact)
+    file_index = cached["index"] if cached is not None else retrieval.BM25Index()
+    results = cached["members"] if cached is not None else _zip_results(ingested, file_index)
+    members = []
+    progress = st.progress(0.0, text=f"Ouverture de l'archive {ingested.name}...")
+    with st.status("Extraction des membres de l'archive", expanded=False) as status:
+        try:
+            for result in results:
+                members.append(result)
+                progress.progress(result["done"] / result["total"],
+                                  text=f"{result['name']} ({result['done']}/{result['total']})")
+                st.write(f"{'✅' if result['status'] == 'ok' else '⏭️' if result['status'] == 'skipped' else '❌'} "
+                         f"{result['name']} — {result.get('detail') or str(result.get('lines', '')) + ' lignes'}")
+                if result.get("digest"):
+                    add_evidence(f"{ingested.name}/{result['name']}", result["digest"])
+            status.update(label=f"Archive traitée : {len(members)} membres", state="complete")
+            if cached is None:
+                cache.put(ingested.sha256(), artifact, {"members": members, "index": file_index})
+        except (archives.ArchiveLimitError, zipfile.BadZipFile) as e:
+            status.update(label=f"Archive rejetée : {e}", state="error")
+    st.session_state.evidence_index.merge(file_index)
+    progress.empty()
+    save_evidence()
+    return {"members": members}
+
+def session_evidence():
+    # Digests des preuves : relus depuis le backend partagé au premier besoin sur ce worker
+    if "evidence" not in st.session_state:
+        session = st.session_state.session
+        st.session_state.evidence = session.get("evidence", {}) if session else {}
+        for name, digest in st.session_state.evidence.items():
+            st.session_state.evidence_index.add_text(f"{name} (digest)", digest)
+    return st.session_state.evidence
+
+def add_evidence(name, digest):
+    # Le digest est aussi indexé : les plus anciens remontent par la recherche BM25 au lieu d'être
+    # tous épinglés à chaque prompt
+    session_evidence()[name] = digest
+    st.session_state.evidence_index.add_text(f"{name} (digest)", digest)
+
+def save_evidence():
+    if st.session_state.session is not None:
+        st.session_state.session.set("evidence", session_evidence())
+
+def reset_conversation(messages=()):
+    st.session_state.messages = [SYSTEM_PROMPT, *messages]
+    st.session_state.older_messages = []
+    st.session_state.visible_messages = history.HISTORY_PAGE_SIZE
+    st.session_state.context_window = ContextWindow()
+
+def load_older_messages():
+    # Page précédente : d'abord ce qui est déjà en mémoire, sinon lecture en base
+    st.session_state.visible_messages += history.HISTORY_PAGE_SIZE
+    shown = st.session_state.older_messages + st.session_state.messages[1:]
+    if st.session_state.visible_messages > len(shown) and shown:
+        st.session_state.older_messages = history.load_page(
+            st.session_state.username, before_id=shown[0]["id"]
+        ) + st.session_state.older_messages
+
+def restore_session(session, username):
+    st.session_state.session = session
     st.session_state.authenticated = True
     st.session_state.username = username
+    # Reprise de la conversation persistée : seule la dernière page est chargée
+    reset_conversation(history.load_page(username))
+
+def login_success(username):
+    session = sessions.open_session(username)
+    st.query_params[sessions.TOKEN_PARAM] = session.token
+    restore_session(session, username)
     st.rerun()
 
 def logout():
+    if st.session_state.session is not None:
+        sessions.close_session(st.session_state.session)
+    st.query_params.pop(sessions.TOKEN_PARAM, None)
+    st.session_state.session = None
     st.session_state.authenticated = False
     st.session_state.username = ""
+    st.session_state.pop("evidence", None)
+    st.session_state.evidence_index = retrieval.BM25Index()
+    reset_conversation()
     st.rerun()
 
+# --- REPRISE DE SESSION (jeton signé dans l'URL : redémarrage ou autre worker) ---
+if not st.session_state.authenticated and sessions.TOKEN_PARAM in st.query_params:
+    resumed = sessions.resume(st.query_params[sessions.TOKEN_PARAM])
+    resumed_user = resumed.get("username") if resumed else None
+    if resumed_user:
+        # Jeton renouvelé à chaque reprise : celui de l'ancienne URL est invalidé
+        st.query_params[sessions.TOKEN_PARAM] = resumed.token
+        restore_session(resumed, resumed_user)
+    else:
+        del st.query_params[sessions.TOKEN_PARAM]
+
 # --- PAGE D'AUTHENTIFICATION (Design amélioré) ---
 def show_auth_page():
     # Utilisation de conteneurs pour centrer et styliser
@@ -206,9 +228,13 @@ def show_auth_page():
         st.markdown(f"<p style='text-align: center; color: #00e5ff;'>Developed by {CREATOR_NAME}</p>", unsafe_allow_html=True)
         st.markdown("---")
         
-        # Utilisation d'une image plus "tech"
-        st.image("https://img.freepik.com/free-vector/dark-gradient-background-with-copy-space_53876-99345.jpg?t=st=1715000000~exp=1715003600~hmac=123", 
-                 caption="Secure Gateway Access Protocol", use_container_width=True)
+        # Bannière servie localement (static/) : mise en cache par le navigateur, fonctionne hors ligne
+        st.markdown(f"""
+            <figure style="margin:0; text-align:center;">
+                <img src="{bootstrap.BANNER_URL}" alt="" style="width:100%; border-radius:8px;">
+                <figcaption style="color:#8892b0; font-size:0.85em;">Secure Gateway Access Protocol</figcaption>
+            </figure>
+            """, unsafe_allow_html=True)
 
         
         st.info("🔒 Accès restreint. Identifiant = Email obligatoire.")
@@ -221,10 +247,13 @@ def show_auth_page():
             login_pass = st.text_input("Mot de passe", type="password", key="login_pass")
             st.write("") # Spacer
             if st.button("❯ INITIALISER LA CONNEXION", key="btn_login"):
-                if check_user(login_user, login_pass):
-                    login_success(login_user)
-                else:
-                    st.error("⛔ Échec d'authentification.")
+                try:
+                    if auth.check_user(login_user, login_pass):
+                        login_success(login_user)
+                    else:
+                        st.error("⛔ Échec d'authentification.")
+                except auth.AuthBusyError:
+                    st.warning("⏳ Passerelle saturée, nouvelle tentative dans quelques secondes.")
 
         with tab2:
             st.subheader("Création de profil d'agent")
@@ -239,20 +268,25 @@ def show_auth_page():
                 elif new_user == "":
                     st.warning("⚠️ Champ email vide.")
                 else:
-                    status = create_user(new_user, new_pass)
+                    try:
+                        status = auth.create_user(new_user, new_pass)
+                    except auth.AuthBusyError:
+                        status = "BUSY"
                     if status == "SUCCESS":
                         st.success("✅ Profil agent créé avec succès. Connectez-vous.")
                     elif status == "EMAIL_INVALID":
                         st.error("❌ Format d'email invalide détecté.")
                     elif status == "EXISTS":
                         st.error("⛔ Cet identifiant est déjà actif dans la base.")
+                    elif status == "BUSY":
+                        st.warning("⏳ Passerelle saturée, nouvelle tentative dans quelques secondes.")
 
 # --- APPLICATION PRINCIPALE (Design amélioré) ---
 def show_main_app():
     # --- Sidebar ---
     with st.sidebar:
         st.title("🌐 CONTROL PANEL")
-        st.markdown(f"Agent connecté :  \n**<span style='color:#00e5ff'>{st.session_state.username}</span>**", unsafe_allow_html=True)
+        st.markdown(f"Agent connecté :  \n**<span style='color:#00e5ff'>{html.escape(st.session_state.username)}</span>**", unsafe_allow_html=True)
         st.caption("Niveau d'accréditation : ALPHA")
         
         st.markdown("---")
@@ -268,6 +302,26 @@ def show_main_app():
             </div></a>
             """, unsafe_allow_html=True)
         
+        cache_stats = response_cache.get_cache().stats()
+        st.caption(f"Cache IA : {cache_stats['hits']} hits / {cache_stats['misses']} miss ({cache_stats['hit_rate']:.0%})")
+        upload_stats = upload_cache.get_cache().stats()
+        st.caption(f"Cache fichiers : {upload_stats['hits']} hits / {upload_stats['misses']} miss ({upload_stats['hit_rate']:.0%})")
+        tracker = usage.get_tracker()
+        quota = f" / {tracker.daily_quota}" if tracker.daily_quota > 0 else ""
+        st.caption(f"Tokens consommés aujourd'hui : {tracker.used_today(st.session_state.username)}{quota}")
+
+        if st.session_state.username in ADMIN_USERS:
+            with st.expander("📈 Télémétrie (admin)"):
+                st.table([
+                    {"métrique": name, "n": s["count"],
+                     "moy.": f"{s['avg']:.3f}" if s["avg"] is not None else "-",
+                     "p50 ≤": s["p50"], "p95 ≤": s["p95"]}
+                    for name, s in metrics.summaries().items()
+                ])
+                st.caption(f"Endpoint Prometheus : http://{metrics.METRICS_HOST}:{metrics.METRICS_PORT}/metrics")
+                st.caption("Consommation de tokens du jour par agent :")
+                st.dataframe(tracker.report(), hide_index=True)
+
         st.markdown("---")
         if st.button("❯ TERMINER LA SESSION"):
             logout()
@@ -278,23 +332,31 @@ def show_main_app():
                 note = st.slider("Niveau de satisfaction", 1, 5, 5)
                 comment = st.text_area("Message du rapport")
                 if st.form_submit_button("Envoyer au commandement"):
-                    st.session_state.feedbacks.append({
-                        "user": st.session_state.username, 
-                        "note": note, 
-                        "comment": comment
-                    })
+                    feedback.get_store().submit(st.session_state.username, note, comment)
                     st.success("Rapport transmis.")
-        
-        if st.session_state.feedbacks:
+
+        # Agrégats précalculés + une seule page de rapports : coût constant par rerun
+        stats = feedback.get_store().aggregates()
+        if stats["total"]:
             st.write("---")
+            st.markdown(f"**<span style='color:#00e5ff'>Satisfaction moyenne : {stats['average']:.1f}⭐</span>** ({stats['total']} rapports)", unsafe_allow_html=True)
+            st.caption(" | ".join(f"{n}⭐ : {count}" for n, count in stats["counts"].items()))
             st.markdown("**<span style='color:#00e5ff'>Derniers rapports :</span>**", unsafe_allow_html=True)
-            for f in st.session_state.feedbacks[::-1]:
+            for f in feedback.get_store().recent(st.session_state.feedback_page):
                 st.markdown(f"""
                     <div style='background-color: #131c2e; padding: 10px; border-radius: 5px; margin-bottom: 10px; border-left: 3px solid #00e5ff;'>
-                        <small style='color: #8892b0;'>Agent: {f['user']} ({f['note']}⭐)</small><br>
-                        {f['comment']}
+                        <small style='color: #8892b0;'>Agent: {html.escape(f['user'])} ({f['note']}⭐)</small><br>
+                        {html.escape(f['comment'])}
                     </div>
                     """, unsafe_allow_html=True)
+            pages = -(-stats["total"] // feedback.FEEDBACK_PAGE_SIZE)
+            col_prev, col_next = st.columns(2)
+            if col_prev.button("◀", key="feedback_prev", disabled=st.session_state.feedback_page == 0):
+                st.session_state.feedback_page -= 1
+                st.rerun()
+            if col_next.button("▶", key="feedback_next", disabled=st.session_state.feedback_page >= pages - 1):
+                st.session_state.feedback_page += 1
+                st.rerun()
 
     # --- Zone Principale ---
     st.markdown(f"<h1 style='text-align: left;'>🤖 CYBER-SENTINEL AI <span style='font-size:0.5em; color:#00e5ff;'>V3.1</span></h1>", unsafe_allow_html=True)
@@ -304,12 +366,30 @@ def show_main_app():
     with st.expander("📂 MODULE D'INGESTION DE DONNÉES (Logs, ZIP, PDF)", expanded=False):
         uploaded_file = st.file_uploader("Glissez vos fichiers preuves ici pour analyse", type=['pdf', 'zip', 'txt', 'log', 'csv'])
         if uploaded_file is not None:
-            st.markdown(f"""
-                <div style='background-color: rgba(46, 204, 113, 0.1); padding: 10px; border-radius: 5px; border: 1px solid #2ecc71;'>
-                    ✅ <b>Fichier ingéré dans le tampon mémoire :</b> {uploaded_file.name} <br>
-                    Taille: {uploaded_file.size} bytes | Type: {uploaded_file.type}
-                </div>
-                """, unsafe_allow_html=True)
+            ingested = ingest_upload(uploaded_file)
+            storage = "fichier temporaire mappé (flux)" if ingested["file"].spilled else "tampon mémoire"
+            stats = ingested["stats"]
+            if stats and "error" in stats:
+                st.error(f"❌ Analyse impossible de {uploaded_file.name} : {stats['error']}")
+            else:
+                if stats and "members" in stats:
+                    lines_info = f" | Membres: {len(stats['members'])}"
+                else:
+                    lines_info = f" | Lignes: {stats['lines']}" if stats else ""
+                    if stats and "pages" in stats:
+                        lines_info += f" | Pages: {stats['pages']}"
+                st.markdown(f"""
+                    <div style='background-color: rgba(46, 204, 113, 0.1); padding: 10px; border-radius: 5px; border: 1px solid #2ecc71;'>
+                        ✅ <b>Fichier ingéré ({storage}) :</b> {html.escape(uploaded_file.name)} <br>
+                        Taille: {uploaded_file.size} bytes | Type: {html.escape(uploaded_file.type or "")}{lines_info}
+                    </div>
+                    """, unsafe_allow_html=True)
+            if stats and stats.get("iocs"):
+                st.caption("Indicateurs de compromission extraits (les plus fréquents par type) :")
+                st.dataframe(stats["iocs"], hide_index=True)
+            if uploaded_file.name in session_evidence():
+                st.caption("Digest transmis à l'IA (à la place du fichier brut) :")
+                st.code(session_evidence()[uploaded_file.name], language=None)
 
     st.divider()
 
@@ -318,18 +398,31 @@ def show_main_app():
     chat_container = st.container(height=500)
 
     with chat_container:
-        for msg in st.session_state.messages:
-            if msg["role"] != "system":
-                st.chat_message(msg["role"]).write(msg["content"])
+        # Rendu paginé : seuls les derniers messages sont affichés à chaque rerun
+        shown = st.session_state.older_messages + st.session_state.messages[1:]
+        page = shown[-st.session_state.visible_messages:]
+        if page and (len(page) < len(shown) or history.has_older(st.session_state.username, page[0]["id"])):
+            st.button("⬆ Charger les messages précédents", key="btn_older", on_click=load_older_messages)
+        for msg in page:
+            with st.chat_message(msg["role"]):
+                st.write(msg["content"])
+                if msg.get("truncated"):
+                    st.caption("⏹ Génération interrompue : réponse partielle.")
 
     # Zone de saisie (Input en bas)
     if prompt := st.chat_input("Entrez votre requête d'analyse ou commande..."):
         # On écrit le message user dans le conteneur
+        # IOC de la requête connus de la base de menaces locale (hors ligne)
+        known = intel.get_store().match(ioc.scan_chunks([prompt]).values(), normalized=True)
+        intel_note = intel.format_matches(known, "requête")
         with chat_container:
-             st.chat_message("user").write(prompt)
+             with st.chat_message("user"):
+                 st.write(prompt)
+                 if intel_note:
+                     st.warning(intel_note)
              msg_container = st.chat_message("assistant")
         
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        st.session_state.messages.append(history.append_message(st.session_state.username, "user", prompt))
         
         try:
             # Tentative de récupération de clé silencieuse
@@ -339,29 +432,65 @@ def show_main_app():
                     st.error("⚠️ Erreur Critique : Clé d'API Groq non détectée dans les secrets.")
                     st.stop()
             
-            client = Groq(api_key=api_key)
-
-            stream = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=st.session_state.messages,
-                stream=True,
-            )
-            def generate_text():
-                for chunk in stream:
-                    if chunk.choices[0].delta.content:
-                        yield chunk.choices[0].delta.content
-            
-            # On écrit la réponse dans le conteneur
+            # Niveau de modèle choisi localement selon la complexité du prompt et la santé des modèles
+            model = router.get_router().choose(prompt, has_evidence=bool(session_evidence()))
+            # Seuls les extraits de preuves (et digests indexés) les plus pertinents pour ce prompt sont joints
+            excerpts = retrieval.format_results(st.session_state.evidence_index.search(prompt))
+            # Textes épinglés par priorité : IOC connus de la requête, dernier digest, extraits, puis
+            # les autres digests, du plus récent au plus ancien, tant que le budget épinglé le permet.
+            # Fenêtre bornée (système + épinglés + résumé + derniers tours), pas tout l'historique
+            evidence = list(session_evidence().values())
+            pinned = [intel_note, *evidence[-1:], excerpts, *reversed(evidence[:-1])]
+            context = st.session_state.context_window.build(st.session_state.messages, pinned=pinned)
+            # Client partagé : connexion keep-alive réutilisée d'un prompt à l'autre
+            completion = Completion(llm.get_client(api_key), st.session_state.username, model, context)
+
+            if completion.cached is not None:
+                # Réponse déjà connue : rejouée par le même chemin write_stream
+                with chat_container:
+                    response = msg_container.write_stream(completion.stream())
+            else:
+                # Passage par l'ordonnanceur global : quotas partagés, équité entre agents, réessais
+                with chat_container:
+                    queue_notice = msg_container.empty()
+                try:
+                    with completion:
+                        chunks = completion.stream(
+                            on_wait=lambda position: queue_notice.caption(f"⏳ File d'attente Groq : position {position + 1}"),
+                            on_retry=lambda attempt, delay: queue_notice.caption(
+                                f"⚠️ Quota fournisseur atteint, nouvel essai n°{attempt} dans {delay:.1f}s"
+                            ),
+                        )
+                        # Bouton d'arrêt à la place de l'avis de file d'attente. Tout rerun (stop,
+                        # nouveau prompt, déconnexion, onglet fermé) interrompt write_stream : le
+                        # flux amont est alors fermé et la réponse partielle gardée, marquée tronquée.
+                        queue_notice.button("⏹ Arrêter la génération", key="btn_stop")
+                        # On écrit la réponse dans le conteneur (TTFT et débit mesurés au passage) ;
+                        # les deltas sont regroupés avant l'envoi au navigateur, sauf le premier
+                        with chat_container:
+                            response = msg_container.write_stream(streaming.coalesce(chunks))
+                finally:
+                    if completion.truncated_text:
+                        st.session_state.messages.append(history.append_message(
+                            st.session_state.username, "assistant", completion.truncated_text, truncated=True))
+                queue_notice.empty()
+
+            st.session_state.messages.append(history.append_message(st.session_state.username, "assistant", response))
+        except usage.QuotaExceeded as e:
             with chat_container:
-                response = msg_container.write_stream(generate_text())
-            
-            st.session_state.messages.append({"role": "assistant", "content": response})
+                st.warning(f"⛔ {e}")
         except Exception as e:
              with chat_container:
                 st.error(f"❌ Erreur de communication neuronale : {e}")
 
 # Lancement conditionnel
-if st.session_state.authenticated:
-    show_main_app()
-else:
-    show_auth_page()
+try:
+    if st.session_state.authenticated:
+        # Chaque interaction compte comme activité : la session n'expire qu'après SESSION_TTL d'inactivité
+        if st.session_state.session is not None:
+            st.session_state.session.keep_alive()
+        show_main_app()
+    else:
+        show_auth_page()
+finally:
+    metrics.RERUN.observe(time.perf_counter() - _rerun_started)
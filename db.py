@@ -0,0 +1,122 @@
+# --- COUCHE D'ACCÈS SQLITE PARTAGÉE ---
+# Un pool de connexions borné par fichier de base, partagé par tout le process
+# (toutes les sessions Streamlit). Le schéma n'est migré qu'une seule fois par
+# process, au lieu d'un CREATE TABLE à chaque rerun.
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import metrics
+
+DB_PATH = os.environ.get("CYBER_DB_PATH", "users.db")
+POOL_SIZE = int(os.environ.get("CYBER_DB_POOL_SIZE", "8"))
+BUSY_TIMEOUT_MS = 5000
+
+# Schéma de la base utilisateurs : chaque entrée est appliquée une fois par process
+USERS_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        username TEXT PRIMARY KEY,
+        password TEXT
+    )
+    ''',
+]
+
+
+class ConnectionPool:
+    """Pool borné de connexions SQLite (mode WAL) vers un même fichier."""
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # check_same_thread=False : une connexion peut servir plusieurs threads
+        # de script successifs, le pool garantit un seul utilisateur à la fois.
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000,
+                               check_same_thread=False, cached_statements=256)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        return conn
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+        # Pool saturé : on attend qu'une connexion soit rendue
+        return self._idle.get()
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put_nowait(conn)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_migrated = set()
+_migrate_lock = threading.Lock()
+
+
+def get_pool(path=None):
+    path = path or DB_PATH
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(path)
+            if pool is None:
+                pool = _pools[path] = ConnectionPool(path)
+    return pool
+
+
+@contextmanager
+def connection(path=None):
+    """Emprunte une connexion au pool ; `with conn:` gère la transaction."""
+    pool = get_pool(path)
+    with metrics.DB_ACQUIRE.time():
+        conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+def migrate(name, statements, path=None):
+    """Applique un groupe de DDL une seule fois par process et par base.
+
+    Une entrée peut aussi être une fonction `f(conn)`, pour les migrations
+    conditionnelles (ALTER TABLE sur une base existante).
+    """
+    key = (path or DB_PATH, name)
+    if key in _migrated:
+        return
+    with _migrate_lock:
+        if key in _migrated:
+            return
+        with connection(path) as conn:
+            with conn:
+                for statement in statements:
+                    if callable(statement):
+                        statement(conn)
+                    else:
+                        conn.execute(statement)
+        _migrated.add(key)
+
+
+def init_db():
+    migrate("users", USERS_SCHEMA)
@@ -0,0 +1,179 @@
+# --- STOCKAGE DES RAPPORTS DE FEEDBACK ---
+# Les rapports sont écrits en base via une file "write-behind" : l'envoi du
+# formulaire ne fait qu'empiler, un thread de fond écrit par lots (sur taille
+# ou délai). Les agrégats (moyenne, nombre par note) sont tenus à jour en
+# mémoire et dans une table dédiée : la barre latérale ne recalcule rien.
+import atexit
+import os
+import queue
+import threading
+import time
+
+import db
+
+FEEDBACK_FLUSH_SIZE = int(os.environ.get("CYBER_FEEDBACK_FLUSH_SIZE", "20"))
+FEEDBACK_FLUSH_INTERVAL = float(os.environ.get("CYBER_FEEDBACK_FLUSH_INTERVAL", "2.0"))
+# Relecture des agrégats en base : les rapports reçus par les autres workers y apparaissent
+FEEDBACK_STATS_REFRESH = float(os.environ.get("CYBER_FEEDBACK_STATS_REFRESH", "10.0"))
+FEEDBACK_PAGE_SIZE = 5
+
+FEEDBACK_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS feedback (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        note INTEGER NOT NULL,
+        comment TEXT NOT NULL,
+        created_at REAL NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS feedback_stats (
+        note INTEGER PRIMARY KEY,
+        count INTEGER NOT NULL
+    )
+    ''',
+]
+
+
+class FeedbackStore:
+    def __init__(self, flush_size=FEEDBACK_FLUSH_SIZE, flush_interval=FEEDBACK_FLUSH_INTERVAL,
+                 stats_refresh=FEEDBACK_STATS_REFRESH):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.stats_refresh = stats_refresh
+        self._queue = queue.Queue()
+        self._pending = []          # reçus mais pas encore écrits (pour l'affichage)
+        self._lock = threading.Lock()
+        db.migrate("feedback", FEEDBACK_SCHEMA)
+        self._counts = {}           # agrégats en base (tous les workers)
+        self._refresh_counts()
+        self._writer = threading.Thread(target=self._run, name="feedback-writer", daemon=True)
+        self._writer.start()
+
+    def submit(self, username, note, comment):
+        item = {"user": username, "note": int(note), "comment": comment, "created_at": time.time()}
+        with self._lock:
+            self._pending.append(item)
+        self._queue.put(item)
+
+    def _refresh_counts(self):
+        with db.connection() as conn:
+            rows = conn.execute('SELECT note, count FROM feedback_stats').fetchall()
+        with self._lock:
+            self._counts = {note: count for note, count in rows}
+        self._counts_read = time.monotonic()
+
+    def _run(self):
+        # Seul ce thread écrit et relit les agrégats : lectures et écritures ne se croisent pas
+        batch = []
+        waiters = []
+        deadline = None
+        while True:
+            wake = self._counts_read + self.stats_refresh
+            if deadline is not None:
+                wake = min(wake, deadline)
+            try:
+                item = self._queue.get(timeout=max(0.0, wake - time.monotonic()))
+            except queue.Empty:
+                item = None
+            if isinstance(item, threading.Event):
+                # flush() : tout ce qui est en file est écrit avant de rendre la main
+                waiters.append(item)
+                while True:
+                    try:
+                        queued = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(queued, threading.Event):
+                        waiters.append(queued)
+                    else:
+                        batch.append(queued)
+            elif item is not None:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if batch and (waiters or len(batch) >= self.flush_size or time.monotonic() >= deadline):
+                try:
+                    self._write(batch)
+                    batch = []
+                    deadline = None
+                except Exception:
+                    # Base momentanément indisponible (verrou, disque) : le lot est gardé et réessayé
+                    deadline = time.monotonic() + self.flush_interval
+            if not batch:
+                for waiter in waiters:
+                    waiter.set()
+                waiters = []
+            if time.monotonic() - self._counts_read >= self.stats_refresh:
+                try:
+                    self._refresh_counts()
+                except Exception:
+                    self._counts_read = time.monotonic()  # nouvel essai à la prochaine période
+
+    def _write(self, batch):
+        per_note = {}
+        for item in batch:
+            per_note[item["note"]] = per_note.get(item["note"], 0) + 1
+        with db.connection() as conn:
+            with conn:
+                conn.executemany(
+                    'INSERT INTO feedback (username, note, comment, created_at) VALUES (?, ?, ?, ?)',
+                    [(i["user"], i["note"], i["comment"], i["created_at"]) for i in batch],
+                )
+                conn.executemany(
+                    'INSERT INTO feedback_stats (note, count) VALUES (?, ?) '
+                    'ON CONFLICT(note) DO UPDATE SET count = count + excluded.count',
+                    list(per_note.items()),
+                )
+        with self._lock:
+            written = {id(item) for item in batch}
+            self._pending = [item for item in self._pending if id(item) not in written]
+            for note, count in per_note.items():
+                self._counts[note] = self._counts.get(note, 0) + count
+
+    def flush(self, timeout=10.0):
+        """Fait écrire par le thread d'écriture tout ce qui est reçu, lot en cours compris (arrêt du process)."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def aggregates(self):
+        """Agrégats en base (relus périodiquement) plus les rapports reçus pas encore écrits."""
+        with self._lock:
+            counts = dict(self._counts)
+            for item in self._pending:
+                counts[item["note"]] = counts.get(item["note"], 0) + 1
+        total = sum(counts.values())
+        average = sum(note * count for note, count in counts.items()) / total if total else None
+        return {"total": total, "average": average, "counts": {note: counts.get(note, 0) for note in range(1, 6)}}
+
+    def recent(self, page=0, page_size=FEEDBACK_PAGE_SIZE):
+        """Une page de rapports, du plus récent au plus ancien (file d'attente incluse)."""
+        with self._lock:
+            pending = self._pending[::-1]
+        offset = page * page_size
+        items = pending[offset:offset + page_size]
+        if len(items) < page_size:
+            db_offset = max(0, offset - len(pending))
+            with db.connection() as conn:
+                rows = conn.execute(
+                    'SELECT username, note, comment FROM feedback ORDER BY id DESC LIMIT ? OFFSET ?',
+                    (page_size - len(items), db_offset),
+                ).fetchall()
+            items += [{"user": row[0], "note": row[1], "comment": row[2]} for row in rows]
+        return items
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = FeedbackStore()
+                atexit.register(_store.flush)
+    return _store
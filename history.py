@@ -0,0 +1,74 @@
+# --- HISTORIQUE DES CONVERSATIONS ---
+# Les messages sont persistés par utilisateur dans users.db. L'interface ne
+# charge que les derniers messages et va chercher les pages plus anciennes
+# à la demande, pour que le coût d'un rerun ne dépende pas de la longueur de
+# la conversation.
+import os
+import time
+
+import db
+
+HISTORY_PAGE_SIZE = int(os.environ.get("CYBER_HISTORY_PAGE_SIZE", "20"))
+
+def _add_truncated_column(conn):
+    # Bases créées avant l'annulation des générations : colonne ajoutée en place
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(messages)')}
+    if "truncated" not in columns:
+        conn.execute('ALTER TABLE messages ADD COLUMN truncated INTEGER NOT NULL DEFAULT 0')
+
+
+HISTORY_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        created_at REAL NOT NULL
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_messages_user ON messages (username, id)',
+    _add_truncated_column,
+]
+
+
+def init_history():
+    db.migrate("history", HISTORY_SCHEMA)
+
+
+def append_message(username, role, content, truncated=False):
+    """Enregistre un message et retourne le dict tel qu'il est gardé en session (avec son id).
+
+    `truncated` marque une réponse dont la génération a été interrompue.
+    """
+    with db.connection() as conn:
+        with conn:
+            cursor = conn.execute(
+                'INSERT INTO messages (username, role, content, truncated, created_at) VALUES (?, ?, ?, ?, ?)',
+                (username, role, content, int(truncated), time.time()),
+            )
+    return {"id": cursor.lastrowid, "role": role, "content": content, "truncated": truncated}
+
+
+def load_page(username, limit=HISTORY_PAGE_SIZE, before_id=None):
+    """Une page de messages, du plus ancien au plus récent, strictement avant `before_id`."""
+    with db.connection() as conn:
+        if before_id is None:
+            rows = conn.execute(
+                'SELECT id, role, content, truncated FROM messages WHERE username = ? ORDER BY id DESC LIMIT ?',
+                (username, limit),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                'SELECT id, role, content, truncated FROM messages WHERE username = ? AND id < ? ORDER BY id DESC LIMIT ?',
+                (username, before_id, limit),
+            ).fetchall()
+    return [{"id": row[0], "role": row[1], "content": row[2], "truncated": bool(row[3])} for row in reversed(rows)]
+
+
+def has_older(username, before_id):
+    with db.connection() as conn:
+        row = conn.execute(
+            'SELECT 1 FROM messages WHERE username = ? AND id < ? LIMIT 1', (username, before_id)
+        ).fetchone()
+    return row is not None
@@ -0,0 +1,148 @@
+# --- PIPELINE D'INGESTION EN FLUX ---
+# Les fichiers preuves (logs, txt, csv) sont lus par blocs de taille fixe via des
+# générateurs. Au-delà d'un seuil, le contenu est déversé dans un fichier
+# temporaire mappé en mémoire : la mémoire consommée par session reste
+# constante, même pour des logs d'authentification de plusieurs centaines de Mo.
+import hashlib
+import io
+import mmap
+import os
+import tempfile
+
+CHUNK_SIZE = int(os.environ.get("CYBER_INGEST_CHUNK_SIZE", str(1024 * 1024)))
+SPILL_THRESHOLD = int(os.environ.get("CYBER_INGEST_SPILL_THRESHOLD", str(8 * 1024 * 1024)))
+ENCODING = "utf-8"
+
+
+def iter_chunks(fileobj, chunk_size=CHUNK_SIZE):
+    """Lit un objet fichier binaire bloc par bloc."""
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def iter_lines(chunks, encoding=ENCODING):
+    """Découpe un flux de blocs binaires en lignes texte, sans tout charger."""
+    pending = b""
+    for chunk in chunks:
+        pending += chunk
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip(b"\r").decode(encoding, errors="replace")
+    if pending:
+        yield pending.rstrip(b"\r").decode(encoding, errors="replace")
+
+
+class IngestedFile:
+    """Fichier preuve ingéré : en mémoire s'il est petit, sinon mappé depuis le disque."""
+
+    def __init__(self, name, size, mime_type=None):
+        self.name = name
+        self.size = size
+        self.type = mime_type
+        self.extension = os.path.splitext(name)[1].lower().lstrip(".")
+        self._buffer = None
+        self._tmp = None
+        self._mmap = None
+        self._sha256 = None
+
+    @classmethod
+    def from_stream(cls, fileobj, name, size=None, mime_type=None,
+                    chunk_size=CHUNK_SIZE, spill_threshold=SPILL_THRESHOLD):
+        if size is None:
+            size = _stream_size(fileobj)
+        ingested = cls(name, size, mime_type)
+        if fileobj.seekable():
+            fileobj.seek(0)
+        if size <= spill_threshold:
+            ingested._buffer = fileobj.read()
+            return ingested
+
+        # Gros fichier : copie bloc par bloc vers le disque, puis mmap en lecture
+        ingested._tmp = tempfile.TemporaryFile(prefix="cyber_ingest_")
+        for chunk in iter_chunks(fileobj, chunk_size):
+            ingested._tmp.write(chunk)
+        ingested._tmp.flush()
+        ingested._mmap = mmap.mmap(ingested._tmp.fileno(), 0, access=mmap.ACCESS_READ)
+        return ingested
+
+    @classmethod
+    def from_path(cls, path, spill_threshold=SPILL_THRESHOLD):
+        """Fichier déjà sur disque : mappé directement, sans copie temporaire."""
+        size = os.path.getsize(path)
+        name = os.path.basename(path)
+        if size <= spill_threshold:
+            with open(path, "rb") as f:
+                return cls.from_stream(f, name, size=size, spill_threshold=spill_threshold)
+        ingested = cls(name, size)
+        ingested._tmp = open(path, "rb")
+        ingested._mmap = mmap.mmap(ingested._tmp.fileno(), 0, access=mmap.ACCESS_READ)
+        return ingested
+
+    @classmethod
+    def from_upload(cls, uploaded_file, **kwargs):
+        return cls.from_stream(uploaded_file, uploaded_file.name, uploaded_file.size,
+                               uploaded_file.type, **kwargs)
+
+    @property
+    def spilled(self):
+        return self._mmap is not None
+
+    def iter_chunks(self, chunk_size=CHUNK_SIZE):
+        data = self._mmap if self._mmap is not None else self._buffer
+        view = memoryview(data)
+        try:
+            for offset in range(0, len(view), chunk_size):
+                yield bytes(view[offset:offset + chunk_size])
+        finally:
+            view.release()
+
+    def sha256(self):
+        """Empreinte du contenu, calculée une fois : clé des caches sur disque (PDF, uploads)."""
+        if self._sha256 is None:
+            digest = hashlib.sha256()
+            for chunk in self.iter_chunks():
+                digest.update(chunk)
+            self._sha256 = digest.hexdigest()
+        return self._sha256
+
+    def iter_lines(self, chunk_size=CHUNK_SIZE):
+        return iter_lines(self.iter_chunks(chunk_size))
+
+    def open(self):
+        """Objet fichier binaire seekable sur le contenu (ex. pour zipfile)."""
+        if self._tmp is not None:
+            return os.fdopen(os.dup(self._tmp.fileno()), "rb")
+        return io.BytesIO(self._buffer)
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._tmp is not None:
+            self._tmp.close()
+            self._tmp = None
+        self._buffer = None
+
+
+def _stream_size(fileobj):
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    return size
+
+
+def line_stats(ingested, lines=None):
+    """Statistiques de base calculées en un seul passage, à mémoire constante."""
+    if lines is None:
+        lines = ingested.iter_lines()
+    count = 0
+    non_empty = 0
+    for line in lines:
+        count += 1
+        if line.strip():
+            non_empty += 1
+    return {"lines": count, "non_empty_lines": non_empty, "bytes": ingested.size}
@@ -0,0 +1,394 @@
+# --- BASE LOCALE D'INDICATEURS (THREAT INTEL HORS LIGNE) ---
+# Déploiement isolé : pas de requête vers un service de réputation. Les flux
+# d'indicateurs (CSV, JSON de type STIX, une valeur par ligne) sont chargés par
+# segments sur disque. Chaque segment est un tableau trié de clés de 64 bits
+# (hachés des valeurs normalisées), ouvert en mmap, précédé d'un filtre de
+# Bloom : les valeurs absentes sont écartées sans toucher au tableau, et le
+# démarrage ne lit que le manifeste, pas le flux.
+#
+#   python intel.py load feodo.csv --source abuse.ch
+#   python intel.py check 185.220.101.4 evil.example.org
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+import numpy as np
+
+from ioc import normalize
+
+INTEL_DIR = os.environ.get("CYBER_INTEL_DIR", "intel_db")
+SEGMENT_ENTRIES = int(os.environ.get("CYBER_INTEL_SEGMENT_ENTRIES", "1000000"))
+# Au-delà, les segments sont fusionnés en un seul
+MAX_SEGMENTS = 16
+BLOOM_BITS_PER_ENTRY = 10  # ~1 % de faux positifs avec 7 fonctions de hachage
+BLOOM_HASHES = 7
+MAX_LABEL_CHARS = 80
+INTEL_TOP_N = 20
+MANIFEST = "manifest.json"
+# Hachage vectorisé des clés : taille des lots et longueur max. traitée en colonnes
+HASH_BATCH = 65536
+VECTOR_KEY_CHARS = 64
+_SEED = 0xCBF29CE484222325
+_PRIME = np.uint64(0x9E3779B97F4A7C15)
+
+# Colonnes CSV reconnues (en minuscules) pour la valeur et pour le libellé de la menace
+CSV_VALUE_COLUMNS = ("indicator", "ioc", "ioc_value", "value", "observable", "ip", "ip_address", "dst_ip",
+                     "domain", "hostname", "url", "md5", "sha1", "sha256", "sha256_hash", "hash")
+CSV_LABEL_COLUMNS = ("threat", "malware", "malware_printable", "threat_type", "tags", "label", "description")
+
+_STIX_VALUE = re.compile(r"value\s*=\s*'([^']+)'")
+
+
+def keys_of(values, normalized=False):
+    """Clés de 64 bits des valeurs, calculées par lots vectorisés (voir _hash_batch)."""
+    if not normalized:
+        values = [normalize(value) for value in values]
+    keys = np.empty(len(values), dtype=np.uint64)
+    for start in range(0, len(values), HASH_BATCH):
+        keys[start:start + HASH_BATCH] = _hash_batch(values[start:start + HASH_BATCH])
+    return keys
+
+
+def _hash_batch(values):
+    # Les valeurs sont rangées dans un tableau UCS-4 de largeur fixe, lu comme des
+    # mots de 64 bits (deux caractères par mot), puis mélangées colonne par colonne
+    # (xor-multiplication puis finaliseur splitmix64). Seuls les mots réellement
+    # occupés par chaque valeur comptent : la clé ne dépend pas de la largeur du lot.
+    lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+    width = int(min(lengths.max(initial=1), VECTOR_KEY_CHARS))
+    width += width % 2
+    words = np.array(values, dtype=f"<U{width}").view("<u8").reshape(len(values), width // 2)
+    used = (np.minimum(lengths, width) + 1) // 2
+    with np.errstate(over="ignore"):
+        keys = np.uint64(_SEED) ^ (lengths.astype(np.uint64) * _PRIME)
+        for column in range(width // 2):
+            keys = np.where(used > column, (keys ^ words[:, column]) * _PRIME, keys)
+        keys ^= keys >> np.uint64(31)
+        keys *= np.uint64(0xBF58476D1CE4E5B9)
+        keys ^= keys >> np.uint64(29)
+    # Valeurs longues (URL surtout) : BLAKE2b, une par une
+    for index in np.flatnonzero(lengths > VECTOR_KEY_CHARS).tolist():
+        digest = hashlib.blake2b(values[index].encode(), digest_size=8).digest()
+        keys[index] = int.from_bytes(digest, "little")
+    return keys
+
+
+def _bloom_bits(count):
+    # Puissance de deux : la position s'obtient par masque, sans division
+    return 1 << max(6, (count * BLOOM_BITS_PER_ENTRY - 1).bit_length())
+
+
+def _bloom_round(keys, bits, n):
+    # Double hachage (Kirsch-Mitzenmacher) à partir des deux moitiés de la clé
+    h1 = keys & np.uint64(0xFFFFFFFF)
+    h2 = (keys >> np.uint64(32)) | np.uint64(1)
+    return (h1 + np.uint64(n) * h2) & np.uint64(bits - 1)
+
+
+def _build_bloom(keys, bits):
+    flags = np.zeros(bits, dtype=bool)
+    for n in range(BLOOM_HASHES):
+        flags[_bloom_round(keys, bits, n)] = True
+    return np.packbits(flags, bitorder="little")
+
+
+class _Segment:
+    """Segment en lecture seule : clés triées, index de libellés et filtre de Bloom, en mmap."""
+
+    def __init__(self, directory, info):
+        self.name = info["name"]
+        self.count = info["count"]
+        self.bloom_bits = info["bloom_bits"]
+        base = os.path.join(directory, self.name)
+        self.keys = np.memmap(base + ".keys", dtype=np.uint64, mode="r")
+        self.labels = np.memmap(base + ".labels", dtype=np.uint32, mode="r")
+        self.bloom = np.memmap(base + ".bloom", dtype=np.uint8, mode="r")
+
+    def lookup(self, keys):
+        """(positions dans `keys`, index de libellé) des clés présentes dans le segment."""
+        # Tour par tour, seuls les survivants sont testés : une valeur absente sort en un ou deux tours
+        candidates = np.arange(len(keys))
+        for n in range(BLOOM_HASHES):
+            positions = _bloom_round(keys[candidates], self.bloom_bits, n)
+            bits = self.bloom[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)
+            candidates = candidates[(bits & 1).astype(bool)]
+            if not len(candidates):
+                return candidates, candidates
+        # Recherche dichotomique sur des clés triées : accès mémoire (mmap) plus locaux
+        candidates = candidates[np.argsort(keys[candidates])]
+        found = np.minimum(np.searchsorted(self.keys, keys[candidates]), self.count - 1)
+        hit = self.keys[found] == keys[candidates]
+        return candidates[hit], self.labels[found[hit]]
+
+
+class IntelStore:
+    def __init__(self, directory=INTEL_DIR):
+        self.directory = directory
+        self.labels = []
+        self._segments = []
+        self._manifest_mtime = None
+        self._lock = threading.Lock()
+
+    # --- Lecture ---
+    def _manifest_path(self):
+        return os.path.join(self.directory, MANIFEST)
+
+    def _refresh(self):
+        # Le manifeste est remplacé atomiquement à chaque chargement : un simple stat suffit
+        try:
+            mtime = os.stat(self._manifest_path()).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._manifest_mtime:
+            return
+        with self._lock:
+            if mtime == self._manifest_mtime:
+                return
+            manifest = self._read_manifest()
+            self._segments = [_Segment(self.directory, info) for info in manifest["segments"]]
+            self.labels = manifest["labels"]
+            self._manifest_mtime = mtime
+
+    def _read_manifest(self):
+        try:
+            with open(self._manifest_path(), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"segments": [], "labels": []}
+
+    @property
+    def version(self):
+        """Change à chaque chargement de flux : invalide les analyses mises en cache avant."""
+        self._refresh()
+        return self._manifest_mtime
+
+    def __len__(self):
+        self._refresh()
+        return sum(segment.count for segment in self._segments)
+
+    def match(self, values, normalized=False):
+        """{valeur: libellé} des valeurs connues ; le segment le plus récent l'emporte.
+
+        `normalized=True` : valeurs déjà canoniques (sortie de ioc.py), sans repasse.
+        """
+        self._refresh()
+        segments = self._segments
+        if not segments:
+            return {}
+        values = list(values)
+        if not values:
+            return {}
+        keys = keys_of(values, normalized)
+        labels = self.labels
+        matches = {}
+        for segment in reversed(segments):
+            positions, label_ids = segment.lookup(keys)
+            for position, label_id in zip(positions.tolist(), label_ids.tolist()):
+                matches.setdefault(values[position], labels[label_id])
+        return matches
+
+    # --- Écriture (un seul chargeur à la fois) ---
+    def add(self, entries):
+        """Ajoute des couples (valeur, libellé) par segments de SEGMENT_ENTRIES ; retourne le nombre lu."""
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            manifest = self._read_manifest()
+            label_ids = {label: n for n, label in enumerate(manifest["labels"])}
+            total = 0
+            values, ids = [], []
+            for value, label in entries:
+                value = normalize(value)
+                if not value:
+                    continue
+                label = label[:MAX_LABEL_CHARS]
+                if label not in label_ids:
+                    label_ids[label] = len(manifest["labels"])
+                    manifest["labels"].append(label)
+                values.append(value)
+                ids.append(label_ids[label])
+                total += 1
+                if len(values) >= SEGMENT_ENTRIES:
+                    manifest["segments"].append(self._write_segment(keys_of(values, normalized=True), ids))
+                    values, ids = [], []
+            if values:
+                manifest["segments"].append(self._write_segment(keys_of(values, normalized=True), ids))
+            replaced = ()
+            if len(manifest["segments"]) > MAX_SEGMENTS:
+                replaced = [info["name"] for info in manifest["segments"]]
+                manifest["segments"] = [self._compact(manifest["segments"])]
+            self._write_manifest(manifest)
+            # Les lecteurs d'autres process gardent leurs mmap ouverts : suppression sans risque (POSIX)
+            for name in replaced:
+                for suffix in (".keys", ".labels", ".bloom"):
+                    os.remove(os.path.join(self.directory, name + suffix))
+        return total
+
+    def _write_segment(self, keys, label_ids):
+        keys = np.asarray(keys, dtype=np.uint64)
+        label_ids = np.asarray(label_ids, dtype=np.uint32)
+        # Dernière occurrence d'une clé dans le lot : la plus récente
+        unique, first = np.unique(keys[::-1], return_index=True)
+        labels = label_ids[::-1][first]
+        return self._save_arrays(unique, labels)
+
+    def _save_arrays(self, keys, labels):
+        name = f"seg-{time.time_ns()}"
+        base = os.path.join(self.directory, name)
+        bloom_bits = _bloom_bits(len(keys))
+        keys.tofile(base + ".keys")
+        labels.tofile(base + ".labels")
+        _build_bloom(keys, bloom_bits).tofile(base + ".bloom")
+        return {"name": name, "count": int(len(keys)), "bloom_bits": int(bloom_bits)}
+
+    def _compact(self, infos):
+        # Concaténation du plus récent au plus ancien : np.unique garde la version la plus récente
+        segments = [_Segment(self.directory, info) for info in reversed(infos)]
+        keys = np.concatenate([segment.keys for segment in segments])
+        labels = np.concatenate([segment.labels for segment in segments])
+        unique, first = np.unique(keys, return_index=True)
+        return self._save_arrays(unique, labels[first])
+
+    def _write_manifest(self, manifest):
+        tmp = self._manifest_path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self._manifest_path())
+
+    def load_feed(self, path, source=None):
+        """Charge un flux d'indicateurs (.csv, .json STIX ou liste, .jsonl, sinon une valeur par ligne)."""
+        return self.add(iter_feed(path, source or os.path.basename(path)))
+
+
+# --- Lecture des flux ---
+def _label(source, threat):
+    threat = (threat or "").strip()
+    return f"{source} : {threat}" if threat else source
+
+
+def _iter_csv(f, source):
+    rows = csv.reader(line for line in f if line.strip() and not line.startswith("#"))
+    first = next(rows, None)
+    if first is None:
+        return
+    header = [name.strip().lower() for name in first]
+    value_index = next((header.index(name) for name in CSV_VALUE_COLUMNS if name in header), None)
+    label_index = next((header.index(name) for name in CSV_LABEL_COLUMNS if name in header), None)
+    if value_index is None:
+        # Pas d'en-tête reconnu : première colonne = valeur, et la première ligne est une donnée
+        value_index = 0
+        rows = _chain([first], rows)
+    for row in rows:
+        if len(row) > value_index:
+            threat = row[label_index] if label_index is not None and len(row) > label_index else ""
+            yield row[value_index], _label(source, threat)
+
+
+def _chain(*iterables):
+    for iterable in iterables:
+        yield from iterable
+
+
+def _stix_entries(objects, source):
+    for obj in objects:
+        if not isinstance(obj, dict):
+            continue
+        if obj.get("type") == "indicator":
+            threat = obj.get("name") or ", ".join(obj.get("labels") or obj.get("indicator_types") or ())
+            for value in _STIX_VALUE.findall(obj.get("pattern", "")):
+                yield value, _label(source, threat)
+        elif isinstance(obj.get("value"), str):
+            # Observables STIX 2.1 (ipv4-addr, domain-name, url, ...)
+            yield obj["value"], _label(source, obj.get("type", ""))
+
+
+def _json_entries(item, source):
+    if isinstance(item, str):
+        yield item, _label(source, "")
+    elif isinstance(item, dict):
+        value = next((item[name] for name in CSV_VALUE_COLUMNS if isinstance(item.get(name), str)), None)
+        if value is not None:
+            threat = next((item[name] for name in CSV_LABEL_COLUMNS if isinstance(item.get(name), str)), "")
+            yield value, _label(source, threat)
+        else:
+            yield from _stix_entries([item], source)
+
+
+def iter_feed(path, source):
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, encoding="utf-8", errors="replace", newline="") as f:
+        if extension == ".csv":
+            yield from _iter_csv(f, source)
+        elif extension == ".json":
+            data = json.load(f)
+            if isinstance(data, dict) and isinstance(data.get("objects"), list):
+                yield from _stix_entries(data["objects"], source)
+            else:
+                for item in data if isinstance(data, list) else [data]:
+                    yield from _json_entries(item, source)
+        elif extension == ".jsonl":
+            for line in f:
+                if line.strip():
+                    yield from _json_entries(json.loads(line), source)
+        else:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    yield line, _label(source, "")
+
+
+def format_matches(matches, name, top=INTEL_TOP_N):
+    """Bloc compact pour le digest / le contexte du chat ; None si aucune correspondance."""
+    if not matches:
+        return None
+    items = sorted(matches.items())[:top]
+    more = f" (+{len(matches) - top} autres)" if len(matches) > top else ""
+    return (f"[INTEL] {name} : {len(matches)} indicateurs connus de la base locale{more}\n"
+            + "\n".join(f"- {value} → {label}" for value, label in items))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = IntelStore()
+    return _store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Base locale d'indicateurs de Cyber-Sentinel.")
+    parser.add_argument("--dir", default=INTEL_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    load = commands.add_parser("load", help="charger un ou plusieurs flux")
+    load.add_argument("feeds", nargs="+")
+    load.add_argument("--source", help="nom de la source (par défaut : nom du fichier)")
+    check = commands.add_parser("check", help="tester des valeurs")
+    check.add_argument("values", nargs="+")
+    args = parser.parse_args(argv)
+
+    store = IntelStore(args.dir)
+    if args.command == "load":
+        for path in args.feeds:
+            start = time.perf_counter()
+            count = store.load_feed(path, args.source)
+            print(f"{path} : {count} indicateurs en {time.perf_counter() - start:.1f}s")
+        print(f"Total : {len(store)} indicateurs")
+        return 0
+    matches = store.match(args.values)
+    for value in args.values:
+        print(f"{value} : {matches.get(value, '-')}")
+    return 0 if matches else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
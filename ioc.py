@@ -0,0 +1,232 @@
+# --- EXTRACTION D'INDICATEURS DE COMPROMISSION (IOC) ---
+# Une seule expression régulière combinée (groupes nommés, compilée une fois)
+# reconnaît URL, emails, hachés MD5/SHA1/SHA256, adresses IPv4/IPv6 et
+# domaines. Aucun IOC ne contient d'espace : le texte est découpé en jetons et
+# dédoublonné en C, et la regex ne voit que les jetons distincts. Les
+# occurrences sont comptées par valeur déjà validée et normalisée.
+import ipaddress
+import os
+import re
+from collections import Counter
+
+import ingestion
+
+TOP_N = int(os.environ.get("CYBER_IOC_TOP_N", "10"))
+# Au-delà, les nouvelles valeurs d'un type ne sont plus suivies (mémoire bornée)
+MAX_DISTINCT = int(os.environ.get("CYBER_IOC_MAX_DISTINCT", "200000"))
+# Taille des blocs de lignes passés à la regex
+BLOCK_CHARS = 1024 * 1024
+# Un jeton plus long que ça sans séparateur est scanné tel quel
+MAX_CARRY = 64 * 1024
+# Jetons distincts dont le résultat est mémorisé d'un bloc à l'autre
+MEMO_SIZE = 500000
+
+KINDS = ("url", "email", "sha256", "sha1", "md5", "ipv4", "ipv6", "domain")
+LABELS = {"url": "URL", "email": "Emails", "sha256": "SHA256", "sha1": "SHA1", "md5": "MD5",
+          "ipv4": "IPv4", "ipv6": "IPv6", "domain": "Domaines"}
+
+_OCTET = r"(?:25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)"
+_LABEL = r"[a-z0-9](?:[a-z0-9-]*[a-z0-9])?"
+
+# L'ordre des alternatives fixe la priorité : une URL n'est pas recomptée comme domaine.
+# Motifs volontairement linéaires (peu de retours arrière) ; IPv6 est large et
+# confirmé ensuite par le module ipaddress.
+IOC_PATTERN = re.compile(
+    r"(?P<url>\b(?:https?|hxxps?|ftp)://[^\s\"'<>()\[\]{}]+)"
+    rf"|(?P<email>\b[\w.+-]+@(?:{_LABEL}\.)+[a-z]{{2,24}}\b)"
+    r"|(?P<sha256>\b[0-9a-f]{64}\b)"
+    r"|(?P<sha1>\b[0-9a-f]{40}\b)"
+    r"|(?P<md5>\b[0-9a-f]{32}\b)"
+    rf"|(?P<ipv4>\b{_OCTET}(?:\.{_OCTET}){{3}}\b)"
+    r"|(?P<ipv6>(?<![0-9a-f:])[0-9a-f]{0,4}(?::[0-9a-f]{0,4}){2,7}(?![0-9a-f:]))"
+    rf"|(?P<domain>\b(?:{_LABEL}\.)+[a-z]{{2,24}}\b)",
+    re.IGNORECASE,
+)
+
+# Séparateurs qui ne font partie d'aucun IOC retenu : ramenés à des espaces
+# avant le découpage en jetons (les CSV n'ont souvent aucun espace par ligne)
+_SEPARATOR_CHARS = ",;|\"'<>()[]{}"
+_SEPARATORS = str.maketrans({c: " " for c in _SEPARATOR_CHARS})
+_BYTE_SEPARATORS = bytes.maketrans(_SEPARATOR_CHARS.encode(), b" " * len(_SEPARATOR_CHARS))
+# Formes « défangées » remises en clair avant le découpage : sans cela les crochets
+# et parenthèses, séparateurs ci-dessus, coupent evil[.]example[.]org en morceaux
+_REFANG = (("[.]", "."), ("(.)", "."), ("[:]", ":"))
+_BYTE_REFANG = tuple((old.encode(), new.encode()) for old, new in _REFANG)
+
+# Faux domaines fréquents dans les logs : noms de fichiers et de modules
+_FILE_SUFFIXES = {
+    "log", "txt", "csv", "json", "xml", "yml", "yaml", "ini", "conf", "cfg", "php", "asp", "aspx", "jsp",
+    "html", "htm", "js", "css", "py", "sh", "pl", "rb", "java", "class", "jar", "exe", "dll", "sys", "bat",
+    "ps1", "zip", "gz", "tar", "pdf", "doc", "docx", "xls", "xlsx", "png", "jpg", "gif", "svg", "pid", "sock",
+    "service", "so", "tmp", "bak", "old", "db", "sql", "md", "rst", "lock", "key", "pem", "crt",
+}
+_URL_TRAILING = ".,;:!?'\""
+
+
+def normalize(value):
+    """Forme canonique d'un indicateur, après « refang » (hxxp, [.]).
+
+    Seule définition de la forme canonique : intel.py l'applique aux flux chargés,
+    et les valeurs extraites ici peuvent être comparées à la base sans repasse.
+    """
+    value = value.strip()
+    if "[" in value or "(" in value:
+        value = value.replace("[.]", ".").replace("(.)", ".").replace("[:]", ":")
+    if "://" in value:
+        if value[:4].lower() == "hxxp":
+            value = "http" + value[4:]
+        return value.rstrip(_URL_TRAILING)
+    return value.lower()
+
+
+def _classify(token):
+    """IOC (type, valeur normalisée) contenus dans un jeton ; appelé une fois par jeton distinct."""
+    # Tout IOC contient '.', ':' ou '@', sauf les hachés (32 caractères au moins)
+    if len(token) < 32 and "." not in token and ":" not in token and "@" not in token:
+        return ()
+    found = []
+    for match in IOC_PATTERN.finditer(token):
+        kind = match.lastgroup
+        value = normalize(match.group())
+        if kind == "ipv6":
+            try:
+                ipaddress.IPv6Address(value)
+            except ValueError:
+                continue  # horodatage, adresse MAC, ...
+        elif kind == "domain" and value.rsplit(".", 1)[1] in _FILE_SUFFIXES:
+            continue
+        found.append((kind, value))
+    return tuple(found)
+
+
+class IocExtractor:
+    """Compteurs d'IOC alimentés par blocs de texte ; les coupures de blocs sont gérées."""
+
+    def __init__(self, max_distinct=MAX_DISTINCT):
+        self.max_distinct = max_distinct
+        self.counts = {kind: Counter() for kind in KINDS}
+        self.dropped = Counter()
+        self._known = set()  # jetons déjà classés
+        self._hits = {}      # jeton -> IOC trouvés dedans (la plupart des jetons n'en ont aucun)
+        self._carry = None
+
+    def _scan(self, text):
+        # Découpage et comptage des jetons en C (str.split + Counter), puis
+        # opérations d'ensembles : la boucle Python ne voit que les jetons encore
+        # jamais rencontrés et ceux qui contiennent un IOC.
+        if isinstance(text, bytes):
+            for old, new in _BYTE_REFANG:
+                text = text.replace(old, new)
+            tokens = Counter(text.translate(_BYTE_SEPARATORS).split())
+        else:
+            for old, new in _REFANG:
+                text = text.replace(old, new)
+            tokens = Counter(text.translate(_SEPARATORS).split())
+        known = self._known
+        if len(known) >= MEMO_SIZE:
+            known.clear()
+            self._hits.clear()
+        for token in tokens.keys() - known:
+            known.add(token)
+            found = _classify(token.decode(ingestion.ENCODING, errors="replace")
+                              if isinstance(token, bytes) else token)
+            if found:
+                self._hits[token] = found
+        for token in tokens.keys() & self._hits.keys():
+            occurrences = tokens[token]
+            for kind, value in self._hits[token]:
+                counter = self.counts[kind]
+                if value in counter or len(counter) < self.max_distinct:
+                    counter[value] += occurrences
+                else:
+                    self.dropped[kind] += occurrences
+
+    def feed(self, text):
+        """Bloc de texte (str) ou d'octets bruts : le jeton coupé en fin de bloc attend le suivant.
+
+        En octets, aucun décodage du bloc : seuls les jetons distincts sont
+        décodés (un séparateur ASCII ne peut pas couper un caractère UTF-8).
+        """
+        text = self._carry + text if self._carry else text
+        blanks = (b"\n", b" ", b"\t") if isinstance(text, bytes) else ("\n", " ", "\t")
+        cut = max(text.rfind(blank) for blank in blanks)
+        if cut < 0 and len(text) < MAX_CARRY:
+            self._carry = text
+            return
+        if cut < 0:
+            cut = len(text) - 1
+        self._carry = text[cut + 1:]
+        self._scan(text[:cut + 1])
+
+    def finish(self):
+        if self._carry:
+            self._scan(self._carry)
+        self._carry = None
+        return self
+
+    def merge(self, counts, dropped=None):
+        """Ajoute les compteurs d'un autre extracteur (autre process, autre membre d'archive)."""
+        for kind, counter in counts.items():
+            self.counts[kind].update(counter)
+        self.dropped.update(dropped or {})
+        return self
+
+    def values(self):
+        """Toutes les valeurs distinctes suivies, tous types confondus (déjà normalisées)."""
+        for counter in self.counts.values():
+            yield from counter
+
+    def tap_lines(self, lines):
+        """Laisse passer les lignes (générateur) en les scannant par blocs, dans la même passe."""
+        block = []
+        size = 0
+        for line in lines:
+            block.append(line)
+            size += len(line) + 1
+            if size >= BLOCK_CHARS:
+                self._scan("\n".join(block))
+                block = []
+                size = 0
+            yield line
+        if block:
+            self._scan("\n".join(block))
+
+    def results(self, top=TOP_N):
+        """{type: [(valeur, occurrences), ...]}, les plus fréquents d'abord, et {type}_distinct."""
+        out = {}
+        for kind, counter in self.counts.items():
+            if counter:
+                out[kind] = counter.most_common(top) if top else counter.most_common()
+                out[kind + "_distinct"] = len(counter)
+        return out
+
+    def rows(self, top=TOP_N):
+        """Lignes du tableau affiché dans l'interface."""
+        results = self.results(top)
+        return [{"type": LABELS[kind], "valeur": value, "occurrences": count}
+                for kind in KINDS for value, count in results.get(kind, ())]
+
+    def to_text(self, name, top=TOP_N, skip=()):
+        """Tableau compact injecté dans le contexte du chat ; None si aucun IOC.
+
+        Les types de `skip` ne figurent que dans le décompte (déjà détaillés ailleurs).
+        """
+        results = self.results(top)
+        kinds = [kind for kind in KINDS if kind in results]
+        if not kinds:
+            return None
+        header = ", ".join(f"{results[kind + '_distinct']} {LABELS[kind]}" for kind in kinds)
+        parts = [f"[IOC] {name} : {header}"]
+        for kind in kinds:
+            if kind in skip:
+                continue
+            parts.append(f"{LABELS[kind]} : " + ", ".join(f"{value} ({count})" for value, count in results[kind]))
+        return "\n".join(parts)
+
+
+def scan_chunks(chunks):
+    """Extraction directe sur des blocs binaires (sans décodage ni découpage en lignes)."""
+    extractor = IocExtractor()
+    for chunk in chunks:
+        extractor.feed(chunk)
+    return extractor.finish()
@@ -0,0 +1,58 @@
+# --- CLIENTS GROQ PARTAGÉS ---
+# Un seul client Groq (et donc un seul pool HTTP keep-alive) par couple
+# clé d'API / réglages, réutilisé par toutes les sessions du process : seul le
+# premier prompt paie la poignée de main TLS. Le SDK groq (et httpx) n'est
+# importé qu'à la création du premier client : la page de connexion n'en paie
+# pas le coût d'import.
+import os
+import threading
+
+import metrics
+
+GROQ_BASE_URL = os.environ.get("GROQ_BASE_URL") or None
+POOL_MAX_CONNECTIONS = int(os.environ.get("CYBER_GROQ_MAX_CONNECTIONS", "20"))
+POOL_MAX_KEEPALIVE = int(os.environ.get("CYBER_GROQ_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY = float(os.environ.get("CYBER_GROQ_KEEPALIVE_EXPIRY", "60"))
+CONNECT_TIMEOUT = float(os.environ.get("CYBER_GROQ_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.environ.get("CYBER_GROQ_READ_TIMEOUT", "60"))
+# Les réessais (429, 5xx, réseau) sont faits par scheduler.py, avec backoff partagé
+MAX_RETRIES = int(os.environ.get("CYBER_GROQ_MAX_RETRIES", "0"))
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+@metrics.CLIENT_SETUP.timed
+def _build_client(api_key, base_url, max_connections, max_keepalive, connect_timeout, read_timeout):
+    import httpx
+    from groq import Groq
+
+    http_client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+    )
+    return Groq(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=MAX_RETRIES)
+
+
+def get_client(api_key, base_url=GROQ_BASE_URL, max_connections=POOL_MAX_CONNECTIONS,
+               max_keepalive=POOL_MAX_KEEPALIVE, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT):
+    """Retourne le client Groq partagé pour ces réglages (créé au premier appel)."""
+    key = (api_key, base_url, max_connections, max_keepalive, connect_timeout, read_timeout)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = _build_client(*key)
+    return client
+
+
+def close_clients():
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
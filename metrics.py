@@ -0,0 +1,173 @@
+# --- INSTRUMENTATION DES CHEMINS CRITIQUES ---
+# Histogrammes légers (buckets fixes, un verrou, aucune allocation par mesure
+# hors étiquettes nouvelles) exposés au format texte Prometheus sur un
+# endpoint HTTP local, et lisibles depuis le panneau d'admin de la sidebar.
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_HOST = os.environ.get("CYBER_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("CYBER_METRICS_PORT", "9464") or 0)  # 0 = endpoint désactivé
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RATE_BUCKETS = (5, 10, 25, 50, 100, 200, 400, 800, 1600)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}  # étiquettes (tuple trié) -> [compteurs par bucket..., somme, total]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def timed(self, fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with self.time():
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def snapshot(self):
+        with self._lock:
+            return {key: list(series) for key, series in self._series.items()}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(key + (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_labels(key)} {series[-1]}")
+        return "\n".join(lines)
+
+    def summary(self):
+        """Vue agrégée (toutes étiquettes) pour le panneau d'admin : nombre, moyenne, p50, p95."""
+        merged = None
+        for series in self.snapshot().values():
+            merged = series if merged is None else [a + b for a, b in zip(merged, series)]
+        if not merged or not merged[-1]:
+            return {"count": 0, "avg": None, "p50": None, "p95": None}
+        return {"count": merged[-1], "avg": merged[-2] / merged[-1],
+                "p50": self._quantile(merged, 0.5), "p95": self._quantile(merged, 0.95)}
+
+    def _quantile(self, series, q):
+        # Borne supérieure du bucket qui contient le quantile
+        target = q * series[-1]
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), series):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return float("inf")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(items):
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in items) + "}"
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def histogram(name, help_text, buckets=LATENCY_BUCKETS):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = Histogram(name, help_text, buckets)
+    return metric
+
+
+def render_all():
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+def summaries():
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return {metric.name: metric.summary() for metric in metrics}
+
+
+# --- Métriques des chemins critiques ---
+DB_ACQUIRE = histogram("cyber_db_acquire_seconds", "Attente d'une connexion du pool SQLite")
+AUTH_CHECK = histogram("cyber_auth_check_user_seconds", "Durée de check_user (hachage inclus)")
+AUTH_CREATE = histogram("cyber_auth_create_user_seconds", "Durée de create_user (hachage inclus)")
+CLIENT_SETUP = histogram("cyber_groq_client_setup_seconds", "Création d'un client Groq (pool HTTP)")
+LLM_REQUEST = histogram("cyber_llm_request_seconds", "Appel completions.create jusqu'aux en-têtes de réponse")
+LLM_TTFT = histogram("cyber_llm_ttft_seconds", "Temps jusqu'au premier token")
+LLM_STREAM = histogram("cyber_llm_stream_seconds", "Durée du flux après le premier token")
+LLM_TOKENS_PER_SECOND = histogram("cyber_llm_tokens_per_second", "Débit de génération", RATE_BUCKETS)
+RERUN = histogram("cyber_rerun_seconds", "Durée d'un rerun complet du script Streamlit")
+
+
+# --- Endpoint HTTP local ---
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_all().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_server = None
+_server_started = False
+_server_lock = threading.Lock()
+
+
+def start_http_server(host=METRICS_HOST, port=METRICS_PORT):
+    """Démarre l'endpoint /metrics une fois par process ; sans effet si désactivé ou port pris."""
+    global _server, _server_started
+    if not port or _server_started:
+        return _server
+    with _server_lock:
+        if not _server_started:
+            _server_started = True
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError:
+                return None  # un autre worker expose déjà ses métriques sur ce port
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server
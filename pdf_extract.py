@@ -0,0 +1,122 @@
+# --- EXTRACTION DU TEXTE DES PDF ---
+# Extraction page par page dans un pool de processus (tous les cœurs, sans
+# bloquer le thread du script Streamlit sur du CPU). Le texte de chaque page est
+# mis en cache sur disque par SHA-256 du fichier et numéro de page : renvoyer
+# le même rapport ou relancer le script ne coûte plus rien.
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+
+PDF_CACHE_DIR = os.environ.get("CYBER_PDF_CACHE_DIR", os.path.join(".cache", "pdf_pages"))
+PDF_MAX_WORKERS = int(os.environ.get("CYBER_PDF_MAX_WORKERS", str(os.cpu_count() or 2)))
+PAGES_PER_TASK = 8
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class _InlinePool:
+    """Extraction sur place, sans pool imbriqué, quand l'appelant est déjà un process de travail (cli.py)."""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def _get_pool():
+    # "spawn" : pas de fork d'un process serveur multi-threadé
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                if PDF_MAX_WORKERS <= 1:
+                    _pool = _InlinePool()
+                else:
+                    _pool = ProcessPoolExecutor(max_workers=PDF_MAX_WORKERS,
+                                                mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _count_pages(path):
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+
+def _extract_pages(path, page_numbers):
+    # Exécuté dans un process du pool : pypdf n'est importé que là
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    return [(n, reader.pages[n].extract_text() or "") for n in page_numbers]
+
+
+def _page_path(cache_dir, sha256, page):
+    return os.path.join(cache_dir, sha256[:2], sha256, f"{page}.txt")
+
+
+def _count_path(cache_dir, sha256):
+    return os.path.join(cache_dir, sha256[:2], sha256, "pages")
+
+
+def _read_cached(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _write_atomic(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def extract_pdf(ingested, progress=None, cache_dir=PDF_CACHE_DIR):
+    """Texte de chaque page d'un PDF ingéré (voir ingestion.IngestedFile).
+
+    `progress(done, total)` est appelé dans le thread appelant au fil des pages
+    extraites. Retourne {"sha256": ..., "pages": [texte page 0, page 1, ...]}.
+    """
+    sha256 = ingested.sha256()
+
+    cached_count = _read_cached(_count_path(cache_dir, sha256))
+    pages = None
+    if cached_count is not None:
+        pages = [_read_cached(_page_path(cache_dir, sha256, n)) for n in range(int(cached_count))]
+        if all(text is not None for text in pages):
+            if progress:
+                progress(len(pages), len(pages))
+            return {"sha256": sha256, "pages": pages}
+
+    # Le pool travaille sur un fichier : une seule copie disque, pas de gros pickles
+    fd, path = tempfile.mkstemp(prefix="cyber_pdf_", suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in ingested.iter_chunks():
+                f.write(chunk)
+        pool = _get_pool()
+        if pages is None:
+            total = pool.submit(_count_pages, path).result()
+            _write_atomic(_count_path(cache_dir, sha256), str(total))
+            pages = [_read_cached(_page_path(cache_dir, sha256, n)) for n in range(total)]
+        missing = [n for n, text in enumerate(pages) if text is None]
+        futures = [pool.submit(_extract_pages, path, missing[i:i + PAGES_PER_TASK])
+                   for i in range(0, len(missing), PAGES_PER_TASK)]
+        for future in as_completed(futures):
+            for n, text in future.result():
+                pages[n] = text
+                _write_atomic(_page_path(cache_dir, sha256, n), text)
+            done = sum(text is not None for text in pages)
+            if progress:
+                progress(done, len(pages))
+    finally:
+        os.remove(path)
+    return {"sha256": sha256, "pages": pages}
@@ -0,0 +1,141 @@
+# --- CACHE DES RÉPONSES DU MODÈLE ---
+# Les mêmes questions (durcissement, CVE...) reviennent souvent : la réponse est
+# mise en cache, clé = hash normalisé (modèle, prompt système, contexte, prompt).
+# Un LRU en mémoire sert les clés chaudes, SQLite garde le reste entre les
+# redémarrages, avec TTL et taille maximale.
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import db
+
+CACHE_DB_PATH = os.environ.get(
+    "CYBER_CACHE_DB_PATH", os.path.join(os.path.dirname(db.DB_PATH), "responses.db")
+)
+CACHE_TTL = int(os.environ.get("CYBER_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.environ.get("CYBER_CACHE_MAX_ENTRIES", "5000"))
+CACHE_MEMORY_ENTRIES = int(os.environ.get("CYBER_CACHE_MEMORY_ENTRIES", "256"))
+REPLAY_CHUNK_CHARS = 24
+
+CACHE_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS responses (
+        key TEXT PRIMARY KEY,
+        response TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        last_access REAL NOT NULL
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)',
+]
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize(text):
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def make_key(model, messages):
+    """Clé de cache : le dernier message est le prompt, le reste le contexte (système inclus)."""
+    payload = [model] + [[m["role"], _normalize(m["content"])] for m in messages]
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode()).hexdigest()
+
+
+def replay(text, chunk_chars=REPLAY_CHUNK_CHARS):
+    """Rejoue une réponse en cache sous forme de flux, pour passer par write_stream."""
+    for i in range(0, len(text), chunk_chars):
+        yield text[i:i + chunk_chars]
+
+
+class ResponseCache:
+    def __init__(self, path=CACHE_DB_PATH, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES,
+                 memory_entries=CACHE_MEMORY_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()  # key -> (response, created_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        db.migrate("responses", CACHE_SCHEMA, path=self.path)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[1] < self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._memory[key]
+
+        with db.connection(self.path) as conn:
+            row = conn.execute('SELECT response, created_at FROM responses WHERE key = ?', (key,)).fetchone()
+            with conn:
+                if row is not None and now - row[1] >= self.ttl:
+                    conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                    row = None
+                elif row is not None:
+                    conn.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, row[0], row[1])
+        return row[0]
+
+    def put(self, key, response):
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now)
+        with db.connection(self.path) as conn:
+            with conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO responses (key, response, created_at, last_access) VALUES (?, ?, ?, ?)',
+                    (key, response, now, now),
+                )
+                conn.execute('DELETE FROM responses WHERE created_at < ?', (now - self.ttl,))
+                conn.execute(
+                    'DELETE FROM responses WHERE key IN '
+                    '(SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)',
+                    (self.max_entries,),
+                )
+
+    def _remember(self, key, response, created_at):
+        self._memory[key] = (response, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Cache partagé par toutes les sessions du process."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
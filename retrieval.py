@@ -0,0 +1,223 @@
+# --- INDEX BM25 LOCAL DES PREUVES ---
+# Index inversé en mémoire, construit incrémentalement sur des morceaux
+# (chunks) de chaque fichier ingéré. Les postings sont stockés dans des
+# tableaux compacts (array), le texte des chunks compressé. À chaque prompt,
+# seuls les k chunks les plus pertinents sont joints : la taille du prompt
+# reste stable quand le volume de preuves augmente. Chaque chunk est identifié
+# par l'empreinte de son contenu : un contenu déjà indexé (même fichier déposé
+# sous un autre nom, digest réindexé à la reprise) n'est pas compté deux fois.
+import bisect
+import hashlib
+import heapq
+import math
+import os
+import re
+import threading
+import zlib
+from array import array
+from collections import Counter
+
+import numpy as np
+
+CHUNK_MAX_LINES = 40
+CHUNK_MAX_CHARS = 1500
+INDEX_MAX_CHUNKS = int(os.environ.get("CYBER_INDEX_MAX_CHUNKS", "50000"))
+RETRIEVAL_TOP_K = int(os.environ.get("CYBER_RETRIEVAL_TOP_K", "5"))
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Garde les IP, CVE, chemins et noms d'hôtes d'un seul tenant
+_TOKEN = re.compile(r"\w[\w.:/\-]*\w|\w")
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+def _chunk_key(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class BM25Index:
+    def __init__(self, max_chunks=INDEX_MAX_CHUNKS):
+        self.max_chunks = max_chunks
+        self._term_ids = {}
+        self._doc_ids = []     # par terme : array('I') des chunks contenant le terme
+        self._tfs = []         # par terme : array('I') des fréquences associées
+        self._lengths = array("I")
+        self._total_length = 0
+        self._sources = []
+        self._texts = []       # texte des chunks, compressé
+        self._keys = []        # empreinte du contenu de chaque chunk
+        # Index d'autres fichiers ajoutés tels quels (voir merge) :
+        # (index, chunks retenus, longueur cumulée, chunks écartés car déjà présents)
+        self._parts = []
+        self._seen = set()     # empreintes de tous les chunks retenus, parts comprises
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._lengths) + sum(limit - len(skip) for _, limit, _, skip in self._parts)
+
+    # Picklable (cache des uploads) : postings concaténés en deux tableaux plats,
+    # bien plus rapides à sérialiser qu'un array par terme ; le verrou n'est pas sérialisé
+    def _packed(self):
+        terms = list(self._term_ids)
+        bounds = np.zeros(len(terms) + 1, dtype=np.int64)
+        bounds[1:] = np.cumsum([len(self._doc_ids[self._term_ids[term]]) for term in terms])
+        doc_ids = b"".join(self._doc_ids[self._term_ids[term]].tobytes() for term in terms)
+        tfs = b"".join(self._tfs[self._term_ids[term]].tobytes() for term in terms)
+        return terms, bounds, doc_ids, tfs
+
+    def __getstate__(self):
+        with self._lock:
+            state = {key: value for key, value in self.__dict__.items()
+                     if key not in ("_lock", "_term_ids", "_doc_ids", "_tfs", "_seen")}
+            state["_postings"] = self._packed()
+        return state
+
+    def __setstate__(self, state):
+        terms, bounds, doc_ids, tfs = state.pop("_postings")
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._seen = set(self._keys)
+        for part, limit, _, skip in self._parts:
+            self._seen.update(key for doc_id, key in enumerate(part._keys[:limit]) if doc_id not in skip)
+        self._term_ids = {term: term_id for term_id, term in enumerate(terms)}
+        self._doc_ids = []
+        self._tfs = []
+        bounds = (bounds * 4).tolist()  # en octets (uint32)
+        for start, end in zip(bounds, bounds[1:]):
+            self._doc_ids.append(array("I", doc_ids[start:end]))
+            self._tfs.append(array("I", tfs[start:end]))
+
+    @property
+    def full(self):
+        return len(self) >= self.max_chunks
+
+    def add_chunk(self, source, text):
+        counts = Counter(tokenize(text))
+        if not counts:
+            return False
+        key = _chunk_key(text)
+        with self._lock:
+            if self.full or key in self._seen:
+                return False
+            self._seen.add(key)
+            self._keys.append(key)
+            doc_id = len(self._lengths)
+            for term, tf in counts.items():
+                term_id = self._term_ids.get(term)
+                if term_id is None:
+                    term_id = self._term_ids[term] = len(self._doc_ids)
+                    self._doc_ids.append(array("I"))
+                    self._tfs.append(array("I"))
+                self._doc_ids[term_id].append(doc_id)
+                self._tfs[term_id].append(tf)
+            length = sum(counts.values())
+            self._lengths.append(length)
+            self._total_length += length
+            self._sources.append(source)
+            self._texts.append(zlib.compress(text.encode("utf-8")))
+        return True
+
+    def tap_lines(self, source, lines):
+        """Laisse passer un flux de lignes en indexant au passage des chunks de lignes."""
+        buffer = []
+        size = 0
+        for line in lines:
+            yield line
+            buffer.append(line)
+            size += len(line) + 1
+            if len(buffer) >= CHUNK_MAX_LINES or size >= CHUNK_MAX_CHARS:
+                self.add_chunk(source, "\n".join(buffer))
+                buffer = []
+                size = 0
+        if buffer:
+            self.add_chunk(source, "\n".join(buffer))
+
+    def add_text(self, source, text):
+        for _ in self.tap_lines(source, text.splitlines()):
+            pass
+
+    def merge(self, other):
+        """Ajoute un autre index (celui d'un fichier, relu du cache) sans recopier ses postings.
+
+        `other` ne doit plus être modifié ensuite. Retourne le nombre de chunks repris.
+        """
+        with other._lock:
+            parts = [(other, len(other._lengths), other._total_length, frozenset())] + other._parts
+        added = 0
+        with self._lock:
+            for part, part_limit, total_length, part_skip in parts:
+                room = self.max_chunks - len(self)
+                if room <= 0:
+                    break
+                # Chunks dont le contenu est déjà indexé : écartés (ils gonfleraient les scores BM25)
+                skip = set(part_skip)
+                kept = limit = 0
+                for doc_id, key in enumerate(part._keys[:part_limit]):
+                    if kept >= room:
+                        break  # capacité atteinte : seuls les premiers chunks de cet index sont repris
+                    limit = doc_id + 1
+                    if doc_id in part_skip or key in self._seen:
+                        skip.add(doc_id)
+                        continue
+                    self._seen.add(key)
+                    kept += 1
+                if not kept:
+                    continue
+                if limit < len(part._lengths) or skip:
+                    total_length = sum(length for doc_id, length in enumerate(part._lengths[:limit])
+                                       if doc_id not in skip)
+                self._parts.append((part, limit, total_length, frozenset(skip)))
+                added += kept
+        return added
+
+    def search(self, query, k=RETRIEVAL_TOP_K):
+        """Les k chunks les mieux classés : liste de (score, source, texte)."""
+        terms = set(tokenize(query))
+        with self._lock:
+            parts = [(self, len(self._lengths), self._total_length, frozenset())] + self._parts
+            n_docs = sum(limit - len(skip) for _, limit, _, skip in parts)
+            if not n_docs or not terms:
+                return []
+            # Statistiques BM25 (df, longueur moyenne) globales à tous les index réunis
+            avg_length = sum(total_length for _, _, total_length, _ in parts) / n_docs
+            scores = {}
+            for term in terms:
+                postings = []
+                for n, (part, limit, _, skip) in enumerate(parts):
+                    term_id = part._term_ids.get(term)
+                    if term_id is None:
+                        continue
+                    doc_ids = part._doc_ids[term_id]
+                    end = len(doc_ids) if limit == len(part._lengths) else bisect.bisect_left(doc_ids, limit)
+                    pairs = zip(doc_ids[:end], part._tfs[term_id][:end])
+                    if skip:
+                        pairs = [(doc_id, tf) for doc_id, tf in pairs if doc_id not in skip]
+                    else:
+                        pairs = list(pairs)
+                    postings.append((n, part, pairs))
+                df = sum(len(pairs) for *_, pairs in postings)
+                if not df:
+                    continue
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                for n, part, pairs in postings:
+                    lengths = part._lengths
+                    for doc_id, tf in pairs:
+                        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc_id] / avg_length)
+                        key = (n, doc_id)
+                        scores[key] = scores.get(key, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [(score, parts[n][0]._sources[doc_id], zlib.decompress(parts[n][0]._texts[doc_id]).decode("utf-8"))
+                    for (n, doc_id), score in best]
+
+
+def format_results(results):
+    """Bloc de contexte joint au prompt avec les extraits retenus."""
+    if not results:
+        return None
+    parts = ["Extraits pertinents des preuves ingérées (recherche BM25 locale) :"]
+    for _, source, text in results:
+        parts.append(f"--- {source} ---\n{text[:CHUNK_MAX_CHARS]}")
+    return "\n".join(parts)
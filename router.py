@@ -0,0 +1,156 @@
+# --- ROUTAGE DES PROMPTS VERS UN NIVEAU DE MODÈLE ---
+# Une question de définition d'une ligne n'a pas besoin du 70B : un
+# classifieur local (sans appel réseau) estime la complexité du prompt et
+# choisit un niveau de modèle. Le routeur suit le TTFT et le débit glissants de
+# chaque modèle et bascule vers l'autre niveau quand l'un se dégrade.
+import math
+import os
+import re
+import statistics
+import threading
+import time
+from collections import deque
+
+import metrics
+from context import CHARS_PER_TOKEN
+
+FAST_MODEL = os.environ.get("CYBER_FAST_MODEL", "llama-3.1-8b-instant")
+STRONG_MODEL = os.environ.get("CYBER_STRONG_MODEL", "llama-3.3-70b-versatile")
+SIMPLE_MAX_CHARS = 160
+STATS_WINDOW = 20
+MIN_SAMPLES = 3
+# Seuils de dégradation : TTFT médian (s) et taux d'erreur sur la fenêtre glissante
+TTFT_DEGRADED = {FAST_MODEL: 2.0, STRONG_MODEL: 5.0}
+ERROR_RATE_DEGRADED = 0.5
+# Sans nouvel échantillon pendant ce délai, un modèle dégradé est de nouveau essayé
+DEGRADED_COOLDOWN = 120.0
+
+_COMPLEX_MARKERS = re.compile(
+    r"analys|corr[ée]l|compar|script|code|explique en d[ée]tail|[ée]tape|pourquoi|comment (?:faire|mettre)|"
+    r"incident|forensi|timeline|chronolog|durciss|hardening|exploit|payload|architecture|strat[ée]gie|rapport|"
+    r"\blog|```",
+    re.IGNORECASE,
+)
+
+
+def classify(prompt, has_evidence=False):
+    """'simple' ou 'complex', à partir d'indices lexicaux bon marché."""
+    text = prompt.strip()
+    if has_evidence or len(text) > SIMPLE_MAX_CHARS or text.count("\n") > 1:
+        return "complex"
+    if text.count("?") > 1 or _COMPLEX_MARKERS.search(text):
+        return "complex"
+    return "simple"
+
+
+class _ModelStats:
+    def __init__(self):
+        self.ttft = deque(maxlen=STATS_WINDOW)
+        self.throughput = deque(maxlen=STATS_WINDOW)
+        self.outcomes = deque(maxlen=STATS_WINDOW)  # True = succès
+        self.updated = time.monotonic()
+
+
+class ModelRouter:
+    def __init__(self, fast_model=FAST_MODEL, strong_model=STRONG_MODEL):
+        self.tiers = {"simple": fast_model, "complex": strong_model}
+        self._stats = {fast_model: _ModelStats(), strong_model: _ModelStats()}
+        self._lock = threading.Lock()
+
+    def degraded(self, model):
+        with self._lock:
+            stats = self._stats[model]
+            if time.monotonic() - stats.updated > DEGRADED_COOLDOWN:
+                return False
+            if len(stats.outcomes) >= MIN_SAMPLES:
+                errors = stats.outcomes.count(False) / len(stats.outcomes)
+                if errors >= ERROR_RATE_DEGRADED:
+                    return True
+            if len(stats.ttft) >= MIN_SAMPLES:
+                return statistics.median(stats.ttft) > TTFT_DEGRADED.get(model, 5.0)
+            return False
+
+    def choose(self, prompt, has_evidence=False):
+        preferred = self.tiers[classify(prompt, has_evidence)]
+        # Même modèle pour les deux niveaux (CYBER_FAST_MODEL = CYBER_STRONG_MODEL) : pas de repli
+        fallback = next((model for model in self.tiers.values() if model != preferred), preferred)
+        if fallback != preferred and self.degraded(preferred) and not self.degraded(fallback):
+            return fallback
+        return preferred
+
+    def record(self, model, ttft, duration, tokens):
+        with self._lock:
+            stats = self._stats.setdefault(model, _ModelStats())
+            stats.ttft.append(ttft)
+            if duration > 0:
+                stats.throughput.append(tokens / duration)
+            stats.outcomes.append(True)
+            stats.updated = time.monotonic()
+
+    def record_error(self, model):
+        with self._lock:
+            stats = self._stats.setdefault(model, _ModelStats())
+            stats.outcomes.append(False)
+            stats.updated = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                model: {
+                    "ttft_median": statistics.median(s.ttft) if s.ttft else None,
+                    "tokens_per_s": statistics.median(s.throughput) if s.throughput else None,
+                    "errors": s.outcomes.count(False),
+                    "samples": len(s.outcomes),
+                }
+                for model, s in self._stats.items()
+            }
+
+
+class StreamTimer:
+    """Mesure TTFT et débit d'un flux de texte au passage, puis les remonte au routeur."""
+
+    def __init__(self, router, model):
+        self.router = router
+        self.model = model
+        self.started = time.perf_counter()
+        self.first_token = None
+        self.chars = 0
+
+    def start(self):
+        """Départ de la mesure : à l'envoi de la requête, après l'attente dans l'ordonnanceur."""
+        self.started = time.perf_counter()
+
+    def wrap(self, chunks):
+        try:
+            for text in chunks:
+                if self.first_token is None:
+                    self.first_token = time.perf_counter()
+                self.chars += len(text)
+                yield text
+        except GeneratorExit:
+            raise  # flux abandonné côté interface : pas une défaillance du modèle
+        except Exception:
+            self.router.record_error(self.model)
+            raise
+        if self.first_token is not None:
+            tokens = math.ceil(self.chars / CHARS_PER_TOKEN)
+            ttft = self.first_token - self.started
+            duration = time.perf_counter() - self.first_token
+            self.router.record(self.model, ttft, duration, tokens)
+            metrics.LLM_TTFT.observe(ttft, model=self.model)
+            metrics.LLM_STREAM.observe(duration, model=self.model)
+            if duration > 0:
+                metrics.LLM_TOKENS_PER_SECOND.observe(tokens / duration, model=self.model)
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ModelRouter()
+    return _router
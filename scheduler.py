@@ -0,0 +1,201 @@
+# --- ORDONNANCEUR DES APPELS GROQ ---
+# Toutes les sessions du process passent par le même ordonnanceur : deux
+# seaux à jetons (requêtes/minute et tokens/minute) lissent la charge envoyée
+# au fournisseur, une file par utilisateur servie à tour de rôle garantit
+# l'équité (une grosse requête qui attend des tokens ne bloque pas les petites
+# des autres utilisateurs, sans pour autant être affamée), et les erreurs de quota (429) ou transitoires sont réessayées avec un backoff
+# exponentiel à gigue au lieu de bloquer tout le monde en même temps.
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+
+GROQ_RPM = int(os.environ.get("CYBER_GROQ_RPM", "30"))
+GROQ_TPM = int(os.environ.get("CYBER_GROQ_TPM", "12000"))
+RETRY_ATTEMPTS = int(os.environ.get("CYBER_GROQ_RETRY_ATTEMPTS", "4"))
+RETRY_BASE_DELAY = float(os.environ.get("CYBER_GROQ_RETRY_BASE_DELAY", "1.0"))
+RETRY_MAX_DELAY = float(os.environ.get("CYBER_GROQ_RETRY_MAX_DELAY", "20.0"))
+POSITION_POLL_INTERVAL = 0.5
+# Réservation pour la réponse, ajoutée à la taille estimée du prompt
+COMPLETION_TOKEN_ESTIMATE = int(os.environ.get("CYBER_COMPLETION_TOKEN_ESTIMATE", "512"))
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Délai avant que `amount` jetons soient disponibles (0 si tout de suite)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def consume(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+
+class _Ticket:
+    def __init__(self, user, tokens):
+        self.user = user
+        self.tokens = tokens
+        self.granted = threading.Event()
+        self.deadline = None  # fin de l'attente prévue, fixée la première fois qu'il est doublé
+
+
+class RequestScheduler:
+    def __init__(self, rpm=GROQ_RPM, tpm=GROQ_TPM):
+        self._requests = TokenBucket(rpm)
+        self._tokens = TokenBucket(tpm)
+        self._queues = OrderedDict()  # user -> deque de tickets, ordre = tour de rôle
+        self._cond = threading.Condition()
+        self._dispatcher = threading.Thread(target=self._dispatch, name="groq-scheduler", daemon=True)
+        self._dispatcher.start()
+
+    def _dispatch(self):
+        with self._cond:
+            while True:
+                if not self._queues:
+                    self._cond.wait()
+                    continue
+                user, delay = self._next_user(time.monotonic())
+                if user is None:
+                    self._cond.wait(delay)
+                    continue
+                queue = self._queues[user]
+                ticket = queue[0]
+                self._requests.consume(1)
+                self._tokens.consume(ticket.tokens)
+                queue.popleft()
+                # L'utilisateur servi repasse en fin de tour
+                del self._queues[user]
+                if queue:
+                    self._queues[user] = queue
+                ticket.granted.set()
+
+    def _next_user(self, now):
+        """Premier utilisateur du tour dont la requête passe tout de suite, sinon (None, délai)."""
+        delay = self._requests.wait_time(1, now)
+        if delay > 0:
+            return None, delay
+        heads = [(user, queue[0]) for user, queue in self._queues.items()]
+        # Une requête déjà doublée pendant toute son attente prévue n'est plus dépassée (pas de famine)
+        overdue = [(user, ticket) for user, ticket in heads if ticket.deadline is not None and now >= ticket.deadline]
+        for user, ticket in overdue[:1] or heads:
+            wait = self._tokens.wait_time(ticket.tokens, now)
+            if wait == 0:
+                return user, 0.0
+            if ticket.deadline is None:
+                ticket.deadline = now + wait
+            delay = wait if not delay else min(delay, wait)
+        return None, delay
+
+    def _submit(self, user, tokens):
+        ticket = _Ticket(user, tokens)
+        with self._cond:
+            self._queues.setdefault(user, deque()).append(ticket)
+            self._cond.notify()
+        return ticket
+
+    def position(self, ticket):
+        """Nombre de requêtes servies avant ce ticket (0 = la prochaine)."""
+        with self._cond:
+            queue = self._queues.get(ticket.user)
+            if queue is None or ticket not in queue:
+                return 0
+            rank = queue.index(ticket)
+            ahead = rank
+            seen_self = False
+            for user, other in self._queues.items():
+                if user == ticket.user:
+                    seen_self = True
+                    continue
+                # Placé avant nous dans le tour : servi rank + 1 fois avant nous, sinon rank fois
+                ahead += min(len(other), rank if seen_self else rank + 1)
+            return ahead
+
+    def adjust_tokens(self, delta):
+        """Corrige le seau de tokens une fois la consommation réelle connue."""
+        with self._cond:
+            self._tokens.consume(delta)
+            self._cond.notify()
+
+    def _cancel(self, ticket):
+        """Retire un ticket abandonné (session arrêtée pendant l'attente) ; quota rendu s'il était déjà accordé."""
+        with self._cond:
+            if ticket.granted.is_set():
+                self._requests.consume(-1)
+                self._tokens.consume(-ticket.tokens)
+            else:
+                queue = self._queues.get(ticket.user)
+                if queue is not None and ticket in queue:
+                    queue.remove(ticket)
+                    if not queue:
+                        del self._queues[ticket.user]
+            self._cond.notify()
+
+    def acquire(self, user, tokens, on_wait=None):
+        ticket = self._submit(user, tokens)
+        try:
+            while not ticket.granted.wait(POSITION_POLL_INTERVAL):
+                if on_wait is not None:
+                    on_wait(self.position(ticket))
+        except BaseException:
+            # on_wait peut lever (arrêt ou rerun Streamlit) : le ticket ne doit pas rester en file
+            self._cancel(ticket)
+            raise
+
+    def run(self, user, tokens, call, on_wait=None, on_retry=None):
+        """Exécute `call()` quand le quota le permet, avec réessais sur 429/5xx/erreur réseau."""
+        for attempt in range(RETRY_ATTEMPTS + 1):
+            self.acquire(user, tokens, on_wait)
+            try:
+                return call()
+            except Exception as e:
+                if attempt == RETRY_ATTEMPTS or not is_retryable(e):
+                    raise
+                delay = retry_delay(e, attempt)
+                if on_retry is not None:
+                    on_retry(attempt + 1, delay)
+                time.sleep(delay)
+
+
+def is_retryable(error):
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    # Erreurs réseau du SDK (pas de code HTTP)
+    import groq
+    return isinstance(error, groq.APIConnectionError)
+
+
+def retry_delay(error, attempt):
+    """Backoff exponentiel à gigue complète, en respectant Retry-After s'il est fourni."""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        floor = float(retry_after) if retry_after else 0.0
+    except ValueError:
+        floor = 0.0
+    ceiling = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)
+    return max(floor, random.uniform(0, ceiling))
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = RequestScheduler()
+    return _scheduler
@@ -0,0 +1,305 @@
+# --- SESSIONS PARTAGÉES ENTRE WORKERS ---
+# st.session_state ne vit que dans le process qui sert le websocket : derrière
+# un répartiteur de charge sans affinité, ou après un redémarrage, l'agent
+# serait déconnecté. L'état de connexion est donc aussi rangé dans un backend
+# partagé (SQLite par défaut, à côté de users.db), retrouvé grâce à un jeton
+# signé (HMAC) porté par l'URL. Chaque champ n'est lu qu'au premier besoin.
+# Le jeton étant visible (historique, captures, en-tête Referer), il est à
+# usage unique : chaque reprise émet un nouveau jeton et invalide l'ancien.
+import base64
+import hashlib
+import hmac
+import importlib
+import json
+import os
+import secrets
+import threading
+import time
+
+import db
+
+# "sqlite", "memory" ou "paquet.module:Classe" pour un backend externe
+SESSION_BACKEND = os.environ.get("CYBER_SESSION_BACKEND", "sqlite")
+SESSION_SECRET = os.environ.get("CYBER_SESSION_SECRET", "")
+# Durée d'inactivité au-delà de laquelle la session expire
+SESSION_TTL = float(os.environ.get("CYBER_SESSION_TTL", str(8 * 3600)))
+# L'échéance est repoussée par l'activité de l'agent, au plus une écriture par intervalle
+SESSION_TOUCH_INTERVAL = float(os.environ.get("CYBER_SESSION_TOUCH_INTERVAL", "300"))
+# Nom du paramètre d'URL qui porte le jeton
+TOKEN_PARAM = "session"
+
+SESSIONS_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS sessions (
+        sid TEXT PRIMARY KEY,
+        expires_at REAL NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS session_fields (
+        sid TEXT NOT NULL,
+        name TEXT NOT NULL,
+        value TEXT NOT NULL,
+        PRIMARY KEY (sid, name)
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_sessions_expiry ON sessions (expires_at)',
+    '''
+    CREATE TABLE IF NOT EXISTS session_secret (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        secret TEXT NOT NULL
+    )
+    ''',
+]
+
+
+class SessionBackend:
+    """Interface d'un backend : sessions identifiées par `sid`, champs sérialisables en JSON."""
+
+    def create(self, ttl=SESSION_TTL):
+        raise NotImplementedError
+
+    def rotate(self, sid, ttl=SESSION_TTL):
+        """Déplace la session sous un nouveau sid (champs conservés) ; None si elle n'existe plus."""
+        raise NotImplementedError
+
+    def touch(self, sid, ttl=SESSION_TTL):
+        """Repousse l'échéance d'une session encore valide."""
+        raise NotImplementedError
+
+    def get(self, sid, name, default=None):
+        raise NotImplementedError
+
+    def set(self, sid, name, value):
+        raise NotImplementedError
+
+    def delete(self, sid):
+        raise NotImplementedError
+
+
+class SQLiteSessionBackend(SessionBackend):
+    def __init__(self, path=None):
+        self.path = path
+        db.migrate("sessions", SESSIONS_SCHEMA, path)
+
+    def create(self, ttl=SESSION_TTL):
+        sid = secrets.token_urlsafe(24)
+        now = time.time()
+        with db.connection(self.path) as conn:
+            with conn:
+                # Purge des sessions expirées au passage (index sur expires_at)
+                conn.execute('DELETE FROM session_fields WHERE sid IN (SELECT sid FROM sessions WHERE expires_at < ?)', (now,))
+                conn.execute('DELETE FROM sessions WHERE expires_at < ?', (now,))
+                conn.execute('INSERT INTO sessions (sid, expires_at) VALUES (?, ?)', (sid, now + ttl))
+        return sid
+
+    def rotate(self, sid, ttl=SESSION_TTL):
+        new_sid = secrets.token_urlsafe(24)
+        with db.connection(self.path) as conn:
+            with conn:
+                moved = conn.execute('UPDATE sessions SET sid = ?, expires_at = ? WHERE sid = ? AND expires_at >= ?',
+                                     (new_sid, time.time() + ttl, sid, time.time())).rowcount
+                if not moved:
+                    return None
+                conn.execute('UPDATE session_fields SET sid = ? WHERE sid = ?', (new_sid, sid))
+        return new_sid
+
+    def touch(self, sid, ttl=SESSION_TTL):
+        now = time.time()
+        with db.connection(self.path) as conn:
+            with conn:
+                conn.execute('UPDATE sessions SET expires_at = ? WHERE sid = ? AND expires_at >= ?', (now + ttl, sid, now))
+
+    def get(self, sid, name, default=None):
+        with db.connection(self.path) as conn:
+            row = conn.execute(
+                'SELECT value FROM session_fields WHERE sid = ? AND name = ?', (sid, name)
+            ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, sid, name, value):
+        with db.connection(self.path) as conn:
+            with conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO session_fields (sid, name, value) VALUES (?, ?, ?)',
+                    (sid, name, json.dumps(value, ensure_ascii=False)),
+                )
+
+    def delete(self, sid):
+        with db.connection(self.path) as conn:
+            with conn:
+                conn.execute('DELETE FROM session_fields WHERE sid = ?', (sid,))
+                conn.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+
+
+class MemorySessionBackend(SessionBackend):
+    """Backend en mémoire du process : un seul worker, sessions perdues au redémarrage."""
+
+    def __init__(self):
+        self._sessions = {}  # sid -> [expires_at, champs]
+        self._lock = threading.Lock()
+
+    def create(self, ttl=SESSION_TTL):
+        sid = secrets.token_urlsafe(24)
+        now = time.time()
+        with self._lock:
+            for expired in [s for s, (expires_at, _) in self._sessions.items() if expires_at < now]:
+                del self._sessions[expired]
+            self._sessions[sid] = [now + ttl, {}]
+        return sid
+
+    def rotate(self, sid, ttl=SESSION_TTL):
+        with self._lock:
+            entry = self._sessions.pop(sid, None)
+            if entry is None or entry[0] < time.time():
+                return None
+            new_sid = secrets.token_urlsafe(24)
+            entry[0] = time.time() + ttl
+            self._sessions[new_sid] = entry
+        return new_sid
+
+    def touch(self, sid, ttl=SESSION_TTL):
+        with self._lock:
+            entry = self._sessions.get(sid)
+            if entry is not None and entry[0] >= time.time():
+                entry[0] = time.time() + ttl
+
+    def get(self, sid, name, default=None):
+        with self._lock:
+            entry = self._sessions.get(sid)
+            if entry is None or name not in entry[1]:
+                return default
+            return json.loads(entry[1][name])
+
+    def set(self, sid, name, value):
+        # Même sérialisation que SQLite : aucune référence partagée avec la session Streamlit
+        with self._lock:
+            if sid in self._sessions:
+                self._sessions[sid][1][name] = json.dumps(value, ensure_ascii=False)
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+
+class Session:
+    """Vue d'une session pour un rerun : chaque champ est lu au premier accès, puis gardé."""
+
+    _MISSING = object()
+
+    def __init__(self, backend, sid):
+        self.backend = backend
+        self.sid = sid
+        self._loaded = {}
+        self._touched = time.monotonic()  # création et reprise fixent déjà l'échéance
+
+    def keep_alive(self, interval=SESSION_TOUCH_INTERVAL):
+        """Activité de l'agent (un rerun) : échéance repoussée, au plus une fois par `interval`."""
+        now = time.monotonic()
+        if now - self._touched >= interval:
+            self.backend.touch(self.sid)
+            self._touched = now
+
+    def get(self, name, default=None):
+        value = self._loaded.get(name, self._MISSING)
+        if value is self._MISSING:
+            value = self._loaded[name] = self.backend.get(self.sid, name, default)
+        return value
+
+    def set(self, name, value):
+        self.backend.set(self.sid, name, value)
+        self._loaded[name] = value
+
+    @property
+    def token(self):
+        return sign(self.sid)
+
+
+# --- Jetons signés ---
+_secret = None
+_secret_lock = threading.Lock()
+
+
+def _get_secret():
+    """Secret HMAC : CYBER_SESSION_SECRET, sinon tiré une fois et partagé via users.db par tous les workers."""
+    global _secret
+    if _secret is None:
+        with _secret_lock:
+            if _secret is None:
+                if SESSION_SECRET:
+                    _secret = SESSION_SECRET.encode()
+                else:
+                    db.migrate("sessions", SESSIONS_SCHEMA)
+                    with db.connection() as conn:
+                        with conn:
+                            conn.execute('INSERT OR IGNORE INTO session_secret (id, secret) VALUES (1, ?)',
+                                         (secrets.token_hex(32),))
+                        _secret = conn.execute('SELECT secret FROM session_secret WHERE id = 1').fetchone()[0].encode()
+    return _secret
+
+
+def _signature(sid):
+    digest = hmac.new(_get_secret(), sid.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def sign(sid):
+    return f"{sid}.{_signature(sid)}"
+
+
+def verify(token):
+    """Retourne le sid d'un jeton authentique, None sinon (sans accès au backend)."""
+    sid, _, signature = (token or "").rpartition(".")
+    if not sid or not hmac.compare_digest(signature, _signature(sid)):
+        return None
+    return sid
+
+
+# --- Backend du process ---
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _build_backend(spec):
+    if spec == "sqlite":
+        return SQLiteSessionBackend()
+    if spec == "memory":
+        return MemorySessionBackend()
+    module_name, _, class_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _build_backend(SESSION_BACKEND)
+    return _backend
+
+
+def open_session(username):
+    """Nouvelle session pour un agent authentifié."""
+    backend = get_backend()
+    session = Session(backend, backend.create())
+    session.set("username", username)
+    return session
+
+
+def resume(token):
+    """Session désignée par un jeton signé, sous un nouveau jeton (l'ancien ne sert plus) et prolongée.
+
+    None si la session est absente, expirée ou le jeton falsifié.
+    """
+    sid = verify(token)
+    if sid is None:
+        return None
+    backend = get_backend()
+    sid = backend.rotate(sid)
+    if sid is None:
+        return None
+    return Session(backend, sid)
+
+
+def close_session(session):
+    session.backend.delete(session.sid)
@@ -0,0 +1,73 @@
+# --- COALESCENCE DU FLUX DE TOKENS ---
+# Chaque delta passé à write_stream devient une mise à jour websocket côté
+# navigateur. On regroupe les deltas et on ne les transmet qu'à l'expiration
+# d'une fenêtre de temps ou au-delà d'une taille, sauf le tout premier, transmis
+# immédiatement pour ne pas dégrader le temps perçu jusqu'au premier token.
+# Generation enveloppe le flux amont pour pouvoir l'annuler en cours de route et
+# relève les tokens facturés (usage.py).
+import os
+import time
+
+FLUSH_INTERVAL = float(os.environ.get("CYBER_STREAM_FLUSH_MS", "60")) / 1000
+FLUSH_CHARS = int(os.environ.get("CYBER_STREAM_FLUSH_CHARS", "200"))
+
+
+def coalesce(chunks, interval=FLUSH_INTERVAL, max_chars=FLUSH_CHARS):
+    """Regroupe les fragments de texte ; interval <= 0 désactive la coalescence."""
+    if interval <= 0:
+        yield from chunks
+        return
+    buffer = []
+    size = 0
+    last_flush = None
+    for text in chunks:
+        if last_flush is None:
+            last_flush = time.monotonic()
+            yield text
+            continue
+        buffer.append(text)
+        size += len(text)
+        now = time.monotonic()
+        if size >= max_chars or now - last_flush >= interval:
+            yield "".join(buffer)
+            buffer.clear()
+            size = 0
+            last_flush = now
+    if buffer:
+        yield "".join(buffer)
+
+
+class Generation:
+    """Flux de complétion en cours : garde le texte reçu et peut être annulé à tout moment."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.parts = []
+        self.finished = False
+        self.cancelled = False
+        self.usage = None  # tokens facturés, rapportés par le dernier chunk du flux
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+    def iter_text(self):
+        for chunk in self.stream:
+            # Groq : x_groq.usage ; API compatible OpenAI : usage (dernier chunk)
+            x_groq = getattr(chunk, "x_groq", None)
+            usage = getattr(chunk, "usage", None) or (x_groq.usage if x_groq is not None else None)
+            if usage is not None:
+                self.usage = usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                self.parts.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+        self.finished = True
+
+    def cancel(self):
+        """Ferme la réponse HTTP amont : la connexion est rendue au pool sans attendre la fin du flux."""
+        if self.finished or self.cancelled:
+            return
+        self.cancelled = True
+        close = getattr(self.stream, "close", None)
+        if close is not None:
+            close()
@@ -0,0 +1,22 @@
+# Les modules de l'app sont à la racine du dépôt (pas de paquet installé).
+# Bases et caches dans un dossier temporaire, avant tout import des modules
+# de l'app : ils lisent leur configuration à l'import.
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+WORKDIR = tempfile.mkdtemp(prefix="cyber_tests_")
+os.environ["CYBER_DB_PATH"] = os.path.join(WORKDIR, "users.db")
+os.environ["CYBER_CACHE_DB_PATH"] = os.path.join(WORKDIR, "responses.db")
+os.environ["CYBER_PDF_CACHE_DIR"] = os.path.join(WORKDIR, "pdf_pages")
+os.environ["CYBER_UPLOAD_CACHE_DIR"] = os.path.join(WORKDIR, "uploads")
+os.environ["CYBER_INTEL_DIR"] = os.path.join(WORKDIR, "intel_db")
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(WORKDIR, ignore_errors=True)
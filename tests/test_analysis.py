@@ -0,0 +1,36 @@
+# --- PRÉ-AGRÉGATION DES LOGS / CSV ---
+import analysis
+
+
+def test_log_digest_counts_failures_and_orders_buckets():
+    lines = [
+        '203.0.113.9 - - [09/Mar/2024:14:01:02 +0000] "POST /login HTTP/1.1" 401 12 "-" "curl/8.0"',
+        '203.0.113.9 - - [10/Feb/2024:09:01:02 +0000] "GET / HTTP/1.1" 200 512 "-" "curl/8.0"',
+        "Jan  5 03:00:00 srv sshd[1]: Failed password for root from 198.51.100.7 port 22",
+    ]
+    digest = analysis.digest_log("acces.log", lines)
+    assert (digest.lines, digest.parsed, digest.failures) == (3, 3, 2)
+    text = digest.to_text()
+    # Ordre chronologique des seaux (syslog sans année : "MM-DD HH:00")
+    assert "01-05 03:00 1/1 (100%); 2024-02-10 09:00 0/1 (0%); 2024-03-09 14:00 1/1 (100%)" in text
+
+
+def test_csv_digest_maps_columns():
+    lines = ["timestamp,src_ip,status,user_agent",
+             "2024-03-09T14:00:01Z,203.0.113.9,403,sqlmap/1.7",
+             "2024-03-09T14:05:00Z,203.0.113.9,200,Mozilla/5.0"]
+    digest = analysis.digest_csv("waf.csv", lines)
+    assert digest.ips["203.0.113.9"] == 2
+    assert digest.failures == 1
+    assert digest.bucket_total == {"2024-03-09 14:00": 2}
+
+
+def test_csv_oversized_field_is_skipped():
+    lines = ["timestamp,src_ip,status,message",
+             "2024-03-09T14:00:01Z,203.0.113.9,401," + "A" * 200_000,
+             "2024-03-09T14:00:02Z,198.51.100.7,200,ok"]
+    digest = analysis.digest_csv("waf.csv", lines)
+    assert digest.skipped == 1
+    assert digest.lines == 1
+    assert dict(digest.ips) == {"198.51.100.7": 1}
+    assert "Lignes illisibles ignorées : 1." in digest.to_text()
@@ -0,0 +1,93 @@
+# --- SERVICE D'AUTHENTIFICATION ---
+import hashlib
+import threading
+import time
+
+import pytest
+
+import auth
+import db
+
+
+@pytest.fixture
+def service():
+    db.init_db()
+    return auth.AuthService(workers=2, max_pending=8, timeout=10)
+
+
+def _stored(username):
+    with db.connection() as conn:
+        return conn.execute("SELECT password FROM users WHERE username = ?", (username,)).fetchone()[0]
+
+
+def test_scrypt_round_trip():
+    stored = auth.hash_password("s3cret!")
+    assert stored.startswith(f"scrypt${auth.SCRYPT_N}$")
+    assert auth.verify_password("s3cret!", stored) == (True, False)
+    assert auth.verify_password("wrong", stored) == (False, False)
+    assert auth.verify_password("s3cret!", "scrypt$bogus") == (False, False)
+
+
+def test_scrypt_above_openssl_default_memory():
+    # N = 32768, r = 8 : 32 Mio, au-delà du plafond par défaut d'OpenSSL sans maxmem
+    stored = auth.hash_password("s3cret!", n=2 ** 15)
+    valid, needs_rehash = auth.verify_password("s3cret!", stored)
+    assert valid and needs_rehash
+
+
+@pytest.mark.parametrize("n", [0, 1, 1000])
+def test_invalid_scrypt_n_is_rejected(n):
+    with pytest.raises(ValueError, match="CYBER_SCRYPT_N"):
+        auth.check_scrypt_params(n=n)
+
+
+def test_create_and_check_user(service):
+    assert service.create_user("pas-un-email", "pw") == "EMAIL_INVALID"
+    assert service.create_user("agent@cybersentinel.com", "pw") == "SUCCESS"
+    assert service.create_user("agent@cybersentinel.com", "pw") == "EXISTS"
+    assert service.check_user("agent@cybersentinel.com", "pw")
+    assert not service.check_user("agent@cybersentinel.com", "autre")
+    assert not service.check_user("inconnu@cybersentinel.com", "pw")
+
+
+def test_legacy_hash_is_rehashed_on_login(service):
+    legacy = hashlib.sha256(b"ancien").hexdigest()
+    with db.connection() as conn:
+        with conn:
+            conn.execute("INSERT INTO users (username, password) VALUES (?, ?)", ("legacy@cybersentinel.com", legacy))
+    assert not service.check_user("legacy@cybersentinel.com", "mauvais")
+    assert _stored("legacy@cybersentinel.com") == legacy
+
+    assert service.check_user("legacy@cybersentinel.com", "ancien")
+    # Migration faite en tâche de fond par le pool
+    deadline = time.monotonic() + 10
+    while _stored("legacy@cybersentinel.com") == legacy and time.monotonic() < deadline:
+        time.sleep(0.05)
+    stored = _stored("legacy@cybersentinel.com")
+    assert stored.startswith("scrypt$")
+    assert service.check_user("legacy@cybersentinel.com", "ancien")
+
+
+def test_full_queue_raises_busy():
+    service = auth.AuthService(workers=1, max_pending=1, timeout=10)
+    release = threading.Event()
+    service._run(release.wait)
+    try:
+        with pytest.raises(auth.AuthBusyError):
+            service.create_user("busy@cybersentinel.com", "pw")
+        assert service.metrics()["rejected"] == 1
+    finally:
+        release.set()
+
+
+def test_timeout_raises_busy_and_frees_slot():
+    service = auth.AuthService(workers=1, max_pending=4, timeout=0.05)
+    release = threading.Event()
+    service._run(release.wait)
+    try:
+        with pytest.raises(auth.AuthBusyError):
+            service.create_user("slow@cybersentinel.com", "pw")
+        # La tâche jamais démarrée a été retirée de la file
+        assert service.metrics()["pending"] == 1
+    finally:
+        release.set()
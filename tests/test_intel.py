@@ -0,0 +1,80 @@
+# --- BASE LOCALE D'INDICATEURS : ALLER-RETOUR CHARGEMENT / CORRESPONDANCE ---
+# Chargement, correspondance, compaction des segments, puis nouvelle
+# correspondance, sur une base temporaire. Chaque lecture passe par une
+# instance neuve, comme un worker qui relit le manifeste écrit par le chargeur.
+import os
+
+import pytest
+
+import intel
+import ioc
+
+ABSENT = ["10.9.8.7", "benign.example.net", "http://benign.example.net/", "0" * 64]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return intel.IntelStore(str(tmp_path))
+
+
+def reader(store):
+    return intel.IntelStore(store.directory)
+
+
+def test_load_then_match(store, tmp_path):
+    feed = tmp_path / "feed.csv"
+    feed.write_text(
+        "indicator,threat\n"
+        "185.220.101.4,Emotet\n"
+        "Evil.Example.ORG,AgentTesla\n"
+        "hxxp://evil-cdn[.]example.org/payload.exe,AgentTesla\n"
+        f"{'a' * 64},Qakbot\n",
+        encoding="utf-8",
+    )
+    assert store.load_feed(str(feed), source="abuse.ch") == 4
+
+    matches = reader(store).match(["185.220.101.4", "evil.example.org", "A" * 64, *ABSENT])
+    assert matches == {
+        "185.220.101.4": "abuse.ch : Emotet",
+        "evil.example.org": "abuse.ch : AgentTesla",
+        "A" * 64: "abuse.ch : Qakbot",
+    }
+
+
+def test_extracted_values_match_without_renormalizing(store):
+    store.add([("hxxp://evil-cdn[.]example.org/payload.exe", "t : AgentTesla")])
+    extractor = ioc.scan_chunks([b"GET hxxp://evil-cdn.example.org/payload.exe. from 10.9.8.7\n"])
+    matches = reader(store).match(extractor.values(), normalized=True)
+    assert matches == {"http://evil-cdn.example.org/payload.exe": "t : AgentTesla"}
+
+
+def test_compaction_keeps_every_value_and_latest_label(store, monkeypatch):
+    monkeypatch.setattr(intel, "SEGMENT_ENTRIES", 2)
+    monkeypatch.setattr(intel, "MAX_SEGMENTS", 3)
+    values = [f"192.0.2.{n}" for n in range(6)]
+    store.add((value, "old") for value in values)
+    assert len(store._read_manifest()["segments"]) == 3
+
+    before = reader(store)
+    assert before.match(values + ABSENT) == {value: "old" for value in values}
+
+    # Quatrième segment : au-delà de MAX_SEGMENTS, tout est fusionné en un seul
+    store.add([(values[0], "new"), ("198.51.100.1", "new")])
+    manifest = store._read_manifest()
+    assert len(manifest["segments"]) == 1
+    assert manifest["segments"][0]["count"] == 7
+    files = {name.rsplit(".", 1)[0] for name in os.listdir(store.directory) if name.startswith("seg-")}
+    assert files == {manifest["segments"][0]["name"]}
+
+    after = reader(store)
+    expected = {value: "old" for value in values[1:]}
+    expected.update({values[0]: "new", "198.51.100.1": "new"})
+    assert after.match(values + ["198.51.100.1"] + ABSENT) == expected
+    assert len(after) == 7
+    # Une instance déjà ouverte voit la compaction au prochain accès
+    assert before.match([values[0]]) == {values[0]: "new"}
+
+
+def test_empty_store_matches_nothing(store):
+    assert reader(store).match(ABSENT) == {}
+    assert len(reader(store)) == 0
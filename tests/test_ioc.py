@@ -0,0 +1,44 @@
+# --- EXTRACTION D'INDICATEURS DE COMPROMISSION ---
+import pytest
+
+import ioc
+
+
+def _values(text):
+    # Même résultat attendu sur du texte et sur des octets bruts
+    extractor = ioc.IocExtractor()
+    extractor.feed(text)
+    as_text = sorted(extractor.finish().values())
+    assert sorted(ioc.scan_chunks([text.encode()]).values()) == as_text
+    return as_text
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("evil[.]example[.]org\n", ["evil.example.org"]),
+    ("hxxp://bad[.]example[.]com/x\n", ["http://bad.example.com/x"]),
+    ("hxxps://cdn(.)example[.]net/p.exe from 10[.]0[.]0[.]1\n", ["10.0.0.1", "https://cdn.example.net/p.exe"]),
+    ("C2 fe80[:]:1 (via evil.example.org)\n", ["evil.example.org", "fe80::1"]),
+])
+def test_defanged_indicators(text, expected):
+    assert _values(text) == expected
+
+
+def test_kinds_and_counts():
+    text = ("Failed password from 203.0.113.9; mail admin@example.org, url=https://example.org/a.php?x=1,\n"
+            "hash " + "d41d8cd98f00b204e9800998ecf8427e" + " seen again 203.0.113.9 config.yml\n")
+    extractor = ioc.IocExtractor()
+    extractor.feed(text)
+    extractor.finish()
+    assert extractor.counts["ipv4"] == {"203.0.113.9": 2}
+    assert list(extractor.counts["email"]) == ["admin@example.org"]
+    assert list(extractor.counts["url"]) == ["https://example.org/a.php?x=1"]
+    assert list(extractor.counts["md5"]) == ["d41d8cd98f00b204e9800998ecf8427e"]
+    # Nom de fichier : pas un domaine
+    assert "config.yml" not in extractor.counts["domain"]
+
+
+def test_token_cut_between_blocks():
+    extractor = ioc.IocExtractor()
+    extractor.feed("connexion vers evil[.]exa")
+    extractor.feed("mple[.]org refusée\n")
+    assert list(extractor.finish().values()) == ["evil.example.org"]
@@ -0,0 +1,55 @@
+# --- INDEX BM25 DES PREUVES ---
+import pickle
+
+import retrieval
+
+AUTH_LOG = "\n".join(f"sshd: Failed password for root from 203.0.113.{i} port 22" for i in range(100))
+WEB_LOG = "\n".join(f"GET /admin.php 404 from 198.51.100.{i}" for i in range(100))
+
+
+def _file_index(name, text):
+    index = retrieval.BM25Index()
+    index.add_text(name, text)
+    return index
+
+
+def _session_index():
+    index = retrieval.BM25Index()
+    index.merge(_file_index("auth.log", AUTH_LOG))
+    index.merge(_file_index("access.log", WEB_LOG))
+    return index
+
+
+def test_duplicate_text_is_indexed_once():
+    index = _file_index("auth.log", AUTH_LOG)
+    size = len(index)
+    index.add_text("auth.log (digest)", AUTH_LOG)
+    assert len(index) == size
+
+
+def test_same_content_under_another_name_is_not_merged_again():
+    index = _session_index()
+    size = len(index)
+    before = index.search("failed password root", k=10)
+    # Même fichier redéposé sous un autre nom, relu depuis le cache
+    copy = pickle.loads(pickle.dumps(_file_index("auth-copy.log", AUTH_LOG)))
+    assert index.merge(copy) == 0
+    assert len(index) == size
+    assert index.search("failed password root", k=10) == before
+
+
+def test_partial_overlap_keeps_only_new_chunks():
+    index = _session_index()
+    size = len(index)
+    extra = "\n".join(f"sudo: session opened for user deploy{i}" for i in range(40))
+    mixed = _file_index("mixed.log", AUTH_LOG + "\n" + extra)
+    added = index.merge(mixed)
+    # Seuls les chunks dont le contenu est nouveau (fin du journal, lignes sudo) sont repris
+    assert 0 < added < len(mixed)
+    assert len(index) == size + added
+    assert index.search("sudo deploy1", k=1)[0][1] == "mixed.log"
+    # Reprise de session : l'index relu du cache garde les chunks écartés hors des résultats
+    resumed = pickle.loads(pickle.dumps(index))
+    assert len(resumed) == size + added
+    assert resumed.merge(_file_index("auth.log", AUTH_LOG)) == 0
+    assert resumed.search("failed password", k=10) == index.search("failed password", k=10)
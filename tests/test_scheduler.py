@@ -0,0 +1,41 @@
+# --- ORDONNANCEUR DES APPELS GROQ ---
+import scheduler
+
+
+def _drained(tpm=600, left=50):
+    # 10 tokens/s ; seau presque vide au départ
+    sched = scheduler.RequestScheduler(rpm=600, tpm=tpm)
+    sched.adjust_tokens(tpm - left)
+    return sched
+
+
+def test_small_request_passes_a_blocked_head():
+    sched = _drained()
+    big = sched._submit("alice", 500)
+    sched.acquire("bob", 20)
+    assert not big.granted.is_set()
+    sched._cancel(big)
+
+
+def test_same_user_keeps_its_order():
+    sched = _drained()
+    big = sched._submit("alice", 500)
+    small = sched._submit("alice", 20)
+    assert not small.granted.wait(0.3)
+    sched._cancel(small)
+    sched._cancel(big)
+
+
+def test_overdue_head_is_no_longer_passed():
+    sched = _drained()
+    with sched._cond:
+        big = sched._submit("alice", 500)
+        sched._submit("bob", 20)
+        now = scheduler.time.monotonic()
+        assert sched._next_user(now)[0] == "bob"
+        assert big.deadline is not None
+        # Attente prévue écoulée sans que le seau ait été rempli (doublé entre-temps)
+        sched._tokens.updated = big.deadline
+        user, delay = sched._next_user(big.deadline)
+        assert user is None and delay > 0
+        sched._queues.clear()
@@ -0,0 +1,92 @@
+# --- SESSIONS PARTAGÉES ENTRE WORKERS ---
+import time
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import auth
+import db
+import sessions
+from conftest import ROOT
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def backend(request, monkeypatch):
+    backend = sessions._build_backend(request.param)
+    monkeypatch.setattr(sessions, "_backend", backend)
+    return backend
+
+
+def test_sign_and_verify():
+    token = sessions.sign("abc")
+    assert sessions.verify(token) == "abc"
+
+
+@pytest.mark.parametrize("token", [None, "", "abc", "abc.", ".sig"])
+def test_malformed_tokens_are_rejected(token):
+    assert sessions.verify(token) is None
+
+
+def test_tampered_tokens_are_rejected():
+    sid, _, signature = sessions.sign("abc").rpartition(".")
+    assert sessions.verify(f"abd.{signature}") is None
+    flipped = signature[:-1] + ("A" if signature[-1] != "A" else "B")
+    assert sessions.verify(f"{sid}.{flipped}") is None
+
+
+def test_resume_rotates_and_old_token_is_single_use(backend):
+    session = sessions.open_session("agent@cybersentinel.com")
+    session.set("evidence", {"a.log": "digest"})
+    token = session.token
+
+    resumed = sessions.resume(token)
+    assert resumed.get("username") == "agent@cybersentinel.com"
+    assert resumed.get("evidence") == {"a.log": "digest"}
+    assert resumed.token != token
+    assert sessions.resume(token) is None
+    assert sessions.resume(resumed.token).get("username") == "agent@cybersentinel.com"
+
+
+def test_expired_session_is_not_resumed(backend):
+    sid = backend.create(ttl=0.05)
+    backend.set(sid, "username", "agent@cybersentinel.com")
+    time.sleep(0.1)
+    assert sessions.resume(sessions.sign(sid)) is None
+
+
+def test_activity_pushes_expiry_back(backend):
+    session = sessions.Session(backend, backend.create(ttl=0.3))
+    session.set("username", "agent@cybersentinel.com")
+    # Throttlé : pas d'écriture avant l'intervalle
+    session.keep_alive(interval=60)
+    time.sleep(0.2)
+    session.keep_alive(interval=0.1)
+    time.sleep(0.2)
+    # Sans keep_alive, la session aurait expiré (TTL de 0,3 s)
+    assert backend.rotate(session.sid) is not None
+
+
+def test_closed_session_is_not_resumed(backend):
+    session = sessions.open_session("agent@cybersentinel.com")
+    sessions.close_session(session)
+    assert sessions.resume(session.token) is None
+
+
+def test_app_resume_rotates_token_in_url(monkeypatch):
+    monkeypatch.chdir(ROOT)
+    db.init_db()
+    auth.create_user("resume@cybersentinel.com", "pw")
+    token = sessions.open_session("resume@cybersentinel.com").token
+
+    at = AppTest.from_file(f"{ROOT}/cyber_advisor.py", default_timeout=60)
+    at.secrets["GROQ_API_KEY"] = "test-key"
+    at.query_params[sessions.TOKEN_PARAM] = token
+    at.run()
+    assert not at.exception
+    assert at.session_state.authenticated
+    assert at.session_state.username == "resume@cybersentinel.com"
+    new_token = at.query_params[sessions.TOKEN_PARAM]
+    new_token = new_token[0] if isinstance(new_token, list) else new_token
+    assert new_token != token
+    assert sessions.resume(token) is None
+    assert sessions.verify(new_token) is not None
@@ -0,0 +1,73 @@
+# --- MODULE D'INGESTION DE L'INTERFACE ---
+# L'app est exécutée sans navigateur (streamlit.testing AppTest), agent déjà
+# connecté, avec un faux st.file_uploader qui rend le fichier de
+# CYBER_TEST_UPLOAD.
+import os
+
+from streamlit.testing.v1 import AppTest
+
+from conftest import ROOT
+
+
+def _app():
+    import io
+    import os
+
+    import streamlit as st
+
+    path = os.environ["CYBER_TEST_UPLOAD"]
+    with open(path, "rb") as f:
+        data = f.read()
+
+    class Upload(io.BytesIO):
+        file_id = path
+        name = os.path.basename(path)
+        size = len(data)
+        type = "application/octet-stream"
+
+    file_uploader = st.file_uploader
+    st.file_uploader = lambda *args, **kwargs: Upload(data)
+    try:
+        app_path = os.path.join(os.environ["CYBER_TEST_ROOT"], "cyber_advisor.py")
+        with open(app_path, encoding="utf-8") as f:
+            exec(compile(f.read(), app_path, "exec"), {"__name__": "__main__"})
+    finally:
+        st.file_uploader = file_uploader
+
+
+def _upload(path, monkeypatch):
+    monkeypatch.setenv("CYBER_TEST_UPLOAD", str(path))
+    monkeypatch.setenv("CYBER_TEST_ROOT", ROOT)
+    monkeypatch.chdir(ROOT)
+    at = AppTest.from_function(_app, default_timeout=60)
+    at.secrets["GROQ_API_KEY"] = "test-key"
+    at.session_state.authenticated = True
+    at.session_state.username = "upload@cybersentinel.com"
+    return at
+
+
+def test_corrupt_pdf_is_reported_not_raised(tmp_path, monkeypatch):
+    pdf = tmp_path / "rapport.pdf"
+    pdf.write_bytes(b"%PDF-1.4\n1 0 obj << /Length 999 >> stream\ntronqu")
+    at = _upload(pdf, monkeypatch).run()
+    assert not at.exception
+    assert any("Analyse impossible de rapport.pdf" in error.value for error in at.error)
+    ingested = at.session_state.ingested
+    assert "error" in ingested["stats"]
+    assert "rapport.pdf" not in at.session_state.evidence
+
+    # Rerun (le fichier reste dans l'uploader) : pas de nouvelle tentative d'analyse
+    at.run()
+    assert not at.exception
+    assert at.session_state.ingested is ingested
+    assert any("Analyse impossible" in error.value for error in at.error)
+
+
+def test_log_upload_adds_evidence(tmp_path, monkeypatch):
+    log = tmp_path / "auth.log"
+    log.write_text("Mar  9 14:01:02 srv sshd[1]: Failed password for root from 203.0.113.9 port 22\n" * 20,
+                   encoding="utf-8")
+    at = _upload(log, monkeypatch).run()
+    assert not at.exception
+    assert not at.error
+    assert "203.0.113.9" in at.session_state.evidence["auth.log"]
@@ -0,0 +1,67 @@
+# --- COMPTABILITÉ DES TOKENS ET QUOTA JOURNALIER ---
+import threading
+
+import pytest
+
+import usage
+
+
+@pytest.fixture
+def tracker():
+    return usage.UsageTracker(flush_interval=3600, daily_quota=100)
+
+
+def test_no_quota_means_no_reservation():
+    tracker = usage.UsageTracker(flush_interval=3600, daily_quota=0)
+    assert tracker.check("libre@cybersentinel.com", 10 ** 9) is None
+
+
+def test_reservations_count_against_the_quota(tracker):
+    first = tracker.check("agent1@cybersentinel.com", 60)
+    with pytest.raises(usage.QuotaExceeded, match="60 réservés"):
+        tracker.check("agent1@cybersentinel.com", 60)
+    # Les autres agents ont leur propre quota
+    tracker.check("agent2@cybersentinel.com", 60)
+    tracker.release(first)
+    tracker.check("agent1@cybersentinel.com", 60)
+
+
+def test_record_settles_the_reservation(tracker):
+    reservation = tracker.check("agent3@cybersentinel.com", 80)
+    tracker.record("agent3@cybersentinel.com", 20, 10, reservation)
+    assert tracker.used_today("agent3@cybersentinel.com") == 30
+    tracker.check("agent3@cybersentinel.com", 70)
+    with pytest.raises(usage.QuotaExceeded):
+        tracker.check("agent3@cybersentinel.com", 1)
+
+
+def test_concurrent_checks_do_not_overshoot(tracker):
+    granted = []
+    barrier = threading.Barrier(8)
+
+    def request():
+        barrier.wait()
+        try:
+            granted.append(tracker.check("agent4@cybersentinel.com", 30))
+        except usage.QuotaExceeded:
+            pass
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(granted) == 3
+
+
+def test_usage_survives_flush_and_report_includes_unwritten(tracker):
+    tracker.record("agent5@cybersentinel.com", 40, 10)
+    tracker.flush()
+    tracker.record("agent5@cybersentinel.com", 5, 5)
+    # Lot en cours d'écriture (flush() d'un autre thread) : encore compté
+    tracker._flushing = {("agent5@cybersentinel.com", usage.today()): [1, 1, 1]}
+    row = next(row for row in tracker.report() if row["agent"] == "agent5@cybersentinel.com")
+    assert (row["prompt"], row["réponse"], row["requêtes"], row["total"]) == (46, 16, 3, 62)
+    assert tracker.used_today("agent5@cybersentinel.com") == 62
+    with pytest.raises(usage.QuotaExceeded):
+        tracker.check("agent5@cybersentinel.com", 39)
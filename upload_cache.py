@@ -0,0 +1,106 @@
+# --- CACHE DES UPLOADS PAR CONTENU ---
+# Les artefacts dérivés d'un fichier preuve (digest, IOC, résultats des membres
+# d'archive, index BM25 du fichier) sont rangés sur disque sous l'empreinte
+# SHA-256 du contenu : le même fichier n'est jamais retraité, quel que soit
+# l'agent, la session ou le worker qui le dépose. Taille totale bornée,
+# éviction LRU (date de modification rafraîchie à chaque lecture).
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+
+UPLOAD_CACHE_DIR = os.environ.get("CYBER_UPLOAD_CACHE_DIR", os.path.join(".cache", "uploads"))
+UPLOAD_CACHE_MAX_BYTES = int(os.environ.get("CYBER_UPLOAD_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+# À incrémenter quand le format des artefacts change : les anciennes entrées sont ignorées
+ARTIFACT_VERSION = 5
+SUFFIX = ".pkl"
+
+
+class UploadCache:
+    def __init__(self, directory=UPLOAD_CACHE_DIR, max_bytes=UPLOAD_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, sha256, artifact):
+        # L'artefact (type, nom du fichier, version de la base de menaces...) est haché dans le nom
+        name = hashlib.sha256(repr((ARTIFACT_VERSION, artifact)).encode()).hexdigest()[:24]
+        return os.path.join(self.directory, sha256[:2], f"{sha256}-{name}{SUFFIX}")
+
+    def get(self, sha256, artifact):
+        """Artefact en cache pour ce contenu, None sinon."""
+        path = self._path(sha256, artifact)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(path)  # entrée récemment utilisée
+        except FileNotFoundError:
+            value = None
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            value = None  # entrée illisible ou d'un ancien format : recalculée
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, sha256, artifact, value):
+        path = self._path(sha256, artifact)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Écriture atomique : un autre worker ne lit jamais une entrée à moitié écrite
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        self._evict()
+
+    def _entries(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(SUFFIX):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue  # évincé entre-temps par un autre worker
+                    yield stat.st_mtime, stat.st_size, path
+
+    def _evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Cache partagé par toutes les sessions du process (et, via le disque, par tous les workers)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = UploadCache()
+    return _cache
@@ -0,0 +1,208 @@
+# --- COMPTABILITÉ DES TOKENS PAR AGENT ---
+# Chaque complétion rapporte ses tokens (prompt / réponse) lus dans le dernier
+# chunk du flux (x_groq.usage). Ils s'accumulent dans des compteurs en mémoire,
+# protégés par un verrou, qu'un thread de fond écrit périodiquement dans la
+# table `usage` de users.db (un cumul par agent et par jour). Un quota
+# journalier optionnel est vérifié avant l'appel réseau, et l'estimation de la
+# requête réservée jusqu'à ce que sa consommation réelle soit connue.
+import atexit
+import os
+import threading
+import time
+
+import db
+from context import count_tokens
+
+USAGE_FLUSH_INTERVAL = float(os.environ.get("CYBER_USAGE_FLUSH_INTERVAL", "30"))
+# Tokens (prompt + réponse) par agent et par jour ; 0 = pas de quota
+DAILY_TOKEN_QUOTA = int(os.environ.get("CYBER_DAILY_TOKEN_QUOTA", "0"))
+
+USAGE_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS usage (
+        username TEXT NOT NULL,
+        day TEXT NOT NULL,
+        prompt_tokens INTEGER NOT NULL,
+        completion_tokens INTEGER NOT NULL,
+        requests INTEGER NOT NULL,
+        PRIMARY KEY (username, day)
+    )
+    ''',
+]
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+def today():
+    return time.strftime("%Y-%m-%d")
+
+
+def token_counts(generation, prompt_estimate):
+    """(prompt, réponse) : chiffres du fournisseur, ou estimation locale si le flux a été interrompu avant."""
+    if generation.usage is not None:
+        return generation.usage.prompt_tokens or 0, generation.usage.completion_tokens or 0
+    return prompt_estimate, count_tokens(generation.text) if generation.text else 0
+
+
+class UsageTracker:
+    def __init__(self, flush_interval=USAGE_FLUSH_INTERVAL, daily_quota=DAILY_TOKEN_QUOTA):
+        self.flush_interval = flush_interval
+        self.daily_quota = daily_quota
+        self._pending = {}   # (agent, jour) -> [prompt, réponse, requêtes] pas encore écrits
+        self._flushing = {}  # lot en cours d'écriture, encore compté dans les contrôles
+        self._reserved = {}  # (agent, jour) -> tokens estimés des requêtes en cours, pas encore comptés
+        self._stored = {}    # (agent, jour) -> (total en base, lu à)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        db.migrate("usage", USAGE_SCHEMA)
+        self._writer = threading.Thread(target=self._run, name="usage-writer", daemon=True)
+        self._writer.start()
+
+    def record(self, username, prompt_tokens, completion_tokens, reservation=None):
+        """Compte une requête terminée (ou interrompue) et solde sa réservation."""
+        with self._lock:
+            counts = self._pending.setdefault((username, today()), [0, 0, 0])
+            counts[0] += prompt_tokens
+            counts[1] += completion_tokens
+            counts[2] += 1
+            self._release(reservation)
+
+    def release(self, reservation):
+        """Rend une réservation sans rien compter (échec avant la réponse)."""
+        with self._lock:
+            self._release(reservation)
+
+    def _release(self, reservation):
+        if reservation is None:
+            return
+        key, tokens = reservation
+        left = self._reserved.get(key, 0) - tokens
+        if left > 0:
+            self._reserved[key] = left
+        else:
+            self._reserved.pop(key, None)
+
+    def _stored_total(self, key):
+        # Total en base (tous les workers), relu au plus une fois par période d'écriture
+        with self._lock:
+            entry = self._stored.get(key)
+        if entry is not None and time.monotonic() - entry[1] < self.flush_interval:
+            return entry[0]
+        with db.connection() as conn:
+            row = conn.execute(
+                'SELECT prompt_tokens + completion_tokens FROM usage WHERE username = ? AND day = ?', key
+            ).fetchone()
+        total = row[0] if row else 0
+        with self._lock:
+            self._stored[key] = (total, time.monotonic())
+        return total
+
+    def used_today(self, username):
+        key = (username, today())
+        stored = self._stored_total(key)
+        with self._lock:
+            unwritten = [counts for counts in (self._pending.get(key), self._flushing.get(key)) if counts]
+            return stored + sum(counts[0] + counts[1] for counts in unwritten)
+
+    def check(self, username, tokens=0):
+        """Réserve les `tokens` estimés de la requête, ou lève QuotaExceeded s'ils feraient dépasser le quota.
+
+        Les réservations des requêtes en cours comptent dans le contrôle : des requêtes
+        simultanées ne passent pas toutes avant que la première soit comptée. La réservation
+        retournée est soldée par record(), ou rendue par release() si la requête échoue.
+        """
+        if self.daily_quota <= 0:
+            return None
+        key = (username, today())
+        stored = self._stored_total(key)
+        with self._lock:
+            unwritten = [counts for counts in (self._pending.get(key), self._flushing.get(key)) if counts]
+            used = stored + sum(counts[0] + counts[1] for counts in unwritten)
+            reserved = self._reserved.get(key, 0)
+            if used + reserved + tokens > self.daily_quota:
+                raise QuotaExceeded(
+                    f"Quota journalier atteint : {used} tokens consommés sur {self.daily_quota}"
+                    + (f", {reserved} réservés par des requêtes en cours" if reserved else "")
+                    + f" (requête estimée à {tokens} tokens)."
+                )
+            self._reserved[key] = reserved + tokens
+        return key, tokens
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                pass  # base momentanément indisponible : les compteurs sont gardés pour la prochaine écriture
+
+    def flush(self):
+        """Écrit les compteurs accumulés (appelé périodiquement et à l'arrêt du process)."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._flushing = batch
+            if not batch:
+                return
+            try:
+                with db.connection() as conn:
+                    with conn:
+                        conn.executemany(
+                            'INSERT INTO usage (username, day, prompt_tokens, completion_tokens, requests) '
+                            'VALUES (?, ?, ?, ?, ?) ON CONFLICT(username, day) DO UPDATE SET '
+                            'prompt_tokens = prompt_tokens + excluded.prompt_tokens, '
+                            'completion_tokens = completion_tokens + excluded.completion_tokens, '
+                            'requests = requests + excluded.requests',
+                            [(*key, *counts) for key, counts in batch.items()],
+                        )
+            except Exception:
+                # Remis dans les compteurs : rien n'est perdu
+                with self._lock:
+                    self._flushing = {}
+                    for key, counts in batch.items():
+                        merged = self._pending.setdefault(key, [0, 0, 0])
+                        for i, value in enumerate(counts):
+                            merged[i] += value
+                raise
+            with self._lock:
+                self._flushing = {}
+                for key in batch:
+                    self._stored.pop(key, None)  # relu au prochain contrôle
+
+    def report(self, day=None):
+        """Consommation du jour par agent, compteurs non écrits inclus (panneau admin)."""
+        day = day or today()
+        with db.connection() as conn:
+            rows = conn.execute(
+                'SELECT username, prompt_tokens, completion_tokens, requests FROM usage WHERE day = ?', (day,)
+            ).fetchall()
+        totals = {row[0]: list(row[1:]) for row in rows}
+        with self._lock:
+            # Compteurs pas encore écrits, y compris le lot en cours d'écriture
+            unwritten = [*self._pending.items(), *self._flushing.items()]
+            for (username, pending_day), counts in unwritten:
+                if pending_day == day:
+                    merged = totals.setdefault(username, [0, 0, 0])
+                    for i, value in enumerate(counts):
+                        merged[i] += value
+        return sorted(
+            ({"agent": username, "prompt": p, "réponse": c, "requêtes": r, "total": p + c}
+             for username, (p, c, r) in totals.items()),
+            key=lambda row: row["total"], reverse=True,
+        )
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_tracker():
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = UsageTracker()
+                atexit.register(_tracker.flush)
+    return _tracker